@@ -0,0 +1,164 @@
+"""
+Планы и время запросов лент с составными индексами и без них.
+
+Создаёт отдельную базу (по умолчанию benchmarks/bench_indexes.sqlite3),
+заполняет её, прогоняет запросы лент и комментариев без индексов из
+миграции 0013 и с ними:
+
+    python benchmarks/bench_indexes.py --posts 1000000
+    python benchmarks/bench_indexes.py --keepdb --json results.json
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import create_db, default_db, destroy_db, setup
+
+BATCH_SIZE = 20000
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+def insert(cursor, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+
+
+def seed(connection, options):
+    """Сырые executemany: миллион строк за секунды, без сигналов ORM."""
+    from django.db import transaction
+    rnd = random.Random(options.seed)
+    users, groups = options.users, options.groups
+    posts, comments = options.posts, options.comments
+    with transaction.atomic(), connection.cursor() as cursor:
+        insert(cursor, (
+            'INSERT INTO auth_user (id, password, is_superuser, username, '
+            'first_name, last_name, email, is_staff, is_active, date_joined) '
+            "VALUES (%s, '', 0, %s, '', '', '', 0, 1, %s)"
+        ), ((i, f'user{i}', START) for i in range(1, users + 1)))
+        insert(cursor, (
+            'INSERT INTO posts_group (id, title, slug, description, '
+            "posts_count) VALUES (%s, %s, %s, '', 0)"
+        ), ((i, f'Группа {i}', f'group-{i}') for i in range(1, groups + 1)))
+        insert(cursor, (
+            'INSERT INTO posts_post (id, text, pub_date, author_id, '
+            'group_id, image, comments_count) '
+            "VALUES (%s, %s, %s, %s, %s, '', 0)"
+        ), ((
+            i, f'Пост {i}', START + timedelta(seconds=i * 30),
+            rnd.randint(1, users),
+            rnd.randint(1, groups) if rnd.random() < 0.7 else None,
+        ) for i in range(1, posts + 1)))
+        insert(cursor, (
+            'INSERT INTO posts_comment (id, text, created, author_id, '
+            'post_id) VALUES (%s, %s, %s, %s, %s)'
+        ), ((
+            i, f'Комментарий {i}', START + timedelta(seconds=i * 15),
+            rnd.randint(1, users), rnd.randint(1, posts),
+        ) for i in range(1, comments + 1)))
+        cursor.execute('ANALYZE')
+
+
+def feed_queries(options):
+    from django.conf import settings
+    from posts.models import Comment, Post
+    page = settings.PAGINATOR_COUNT
+    posts = Post.objects.select_related('author', 'group')
+    return {
+        'index': lambda rnd: posts.all()[:page],
+        'profile': lambda rnd: posts.filter(
+            author_id=rnd.randint(1, options.users))[:page],
+        'group': lambda rnd: posts.filter(
+            group_id=rnd.randint(1, options.groups))[:page],
+        'profile_cursor': lambda rnd: posts.filter(
+            author_id=rnd.randint(1, options.users)
+        ).order_by('-pub_date', '-pk')[:page + 1],
+        'comments': lambda rnd: Comment.objects.filter(
+            post_id=rnd.randint(1, options.posts)
+        ).select_related('author'),
+    }
+
+
+def measure(options):
+    rnd = random.Random(options.seed)
+    results = {}
+    for name, make in feed_queries(options).items():
+        plan = make(rnd).explain()
+        timings = []
+        for _ in range(options.repeat):
+            queryset = make(rnd)
+            started = time.perf_counter()
+            list(queryset)
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = {
+            'plan': plan,
+            'median_ms': round(statistics.median(timings), 3),
+            'max_ms': round(max(timings), 3),
+        }
+    return results
+
+
+def feed_indexes():
+    from posts.models import Comment, Post
+    return [
+        (model, index)
+        for model in (Post, Comment) for index in model._meta.indexes
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--comments', type=int, default=None)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--groups', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--db', default=default_db('bench_indexes'))
+    parser.add_argument('--keepdb', action='store_true')
+    parser.add_argument('--json', help='Куда сохранить результаты')
+    options = parser.parse_args()
+    if options.comments is None:
+        options.comments = options.posts
+
+    connection = setup(options.db)
+    seeded = create_db(connection, options.db, options.keepdb)
+    try:
+        if not seeded:
+            started = time.perf_counter()
+            seed(connection, options)
+            print(f'Заполнение: {time.perf_counter() - started:.1f} с')
+        report = {'options': vars(options)}
+        with connection.schema_editor() as editor:
+            for model, index in feed_indexes():
+                editor.remove_index(model, index)
+        report['before'] = measure(options)
+        with connection.schema_editor() as editor:
+            for model, index in feed_indexes():
+                editor.add_index(model, index)
+        connection.cursor().execute('ANALYZE')
+        report['after'] = measure(options)
+    finally:
+        destroy_db(connection, options.db, options.keepdb)
+
+    for name in report['before']:
+        before, after = report['before'][name], report['after'][name]
+        print(f'\n== {name}: {before["median_ms"]} мс -> '
+              f'{after["median_ms"]} мс (медиана)')
+        print(f'   без индексов: {before["plan"]}')
+        print(f'   с индексами:  {after["plan"]}')
+    if options.json:
+        with open(options.json, 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
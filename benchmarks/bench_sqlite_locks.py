@@ -0,0 +1,186 @@
+"""
+Конкурентная запись в SQLite: ошибки «database is locked» и задержки.
+
+Несколько процессов, как воркеры gunicorn, одновременно читают страницы
+постов и пишут посты и комментарии через django.test.Client. Прогон
+повторяется для двух профилей базы:
+
+    default     журнал DELETE, обычный BEGIN, без повторов, соединение
+                на каждый запрос — как было до профиля;
+    production  SQLITE_PRAGMAS, BEGIN IMMEDIATE, CONN_MAX_AGE
+                и DB_WRITE_RETRIES из настроек проекта.
+
+    python benchmarks/bench_sqlite_locks.py --workers 8 --requests 200
+"""
+import argparse
+import io
+import logging
+import multiprocessing
+import random
+import time
+from collections import Counter
+
+from bench_urls import percentile
+from common import create_db, default_db, destroy_db, setup
+
+PROFILES = ('default', 'production')
+
+
+def profile_settings(name, production):
+    if name == 'production':
+        return production
+    return {
+        'SQLITE_PRAGMAS': {},
+        'journal_mode': 'DELETE',
+        'CONN_MAX_AGE': 0,
+        'DB_WRITE_RETRIES': 0,
+        'transaction_mode': None,
+    }
+
+
+def apply_profile(values):
+    from django.conf import settings
+    from django.db import connection, connections
+    settings.SQLITE_PRAGMAS = values['SQLITE_PRAGMAS']
+    settings.DB_WRITE_RETRIES = values['DB_WRITE_RETRIES']
+    # Режим журнала хранится в файле базы; менять его можно, только пока
+    # база открыта одним соединением, поэтому до запуска процессов
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA journal_mode = {values['journal_mode']}")
+    connections.close_all()
+    # Соединения процессов откроются заново с этими параметрами
+    settings_dict = connections['default'].settings_dict
+    settings_dict['CONN_MAX_AGE'] = values['CONN_MAX_AGE']
+    settings_dict['OPTIONS'] = {
+        key: value for key, value in settings_dict['OPTIONS'].items()
+        if key != 'transaction_mode'
+    }
+    if values['transaction_mode']:
+        settings_dict['OPTIONS']['transaction_mode'] = (
+            values['transaction_mode']
+        )
+
+
+def login(client, user_id):
+    from django.db import OperationalError
+    from posts.models import User
+    while True:
+        try:
+            client.force_login(User.objects.get(pk=user_id))
+            return
+        except OperationalError:
+            time.sleep(0.01)
+
+
+def worker(args):
+    seed, requests, write_share, post_ids, user_id = args
+    from django.db import OperationalError, close_old_connections
+    from django.test import Client
+    from django.urls import reverse
+    rng = random.Random(seed)
+    client = Client()
+    login(client, user_id)
+    results = []
+    for i in range(requests):
+        post_id = rng.choice(post_ids)
+        kind = 'write' if rng.random() < write_share else 'read'
+        started = time.perf_counter()
+        error = None
+        try:
+            if kind == 'read':
+                client.get(reverse('posts:post_detail', args=[post_id]))
+            elif i % 2:
+                client.post(reverse('posts:post_create'), {
+                    'text': f'Пост из бенчмарка {seed}-{i}'
+                })
+            else:
+                client.post(reverse('posts:add_comment', args=[post_id]), {
+                    'text': f'Комментарий из бенчмарка {seed}-{i}'
+                })
+        except OperationalError as exception:
+            error = str(exception)
+        results.append((kind, (time.perf_counter() - started) * 1000, error))
+        # Как WSGI-сервер в конце запроса: закрыть соединения старше
+        # CONN_MAX_AGE (тестовый Client сам этого не делает)
+        close_old_connections()
+    return results
+
+
+def run_profile(options, post_ids, user_ids):
+    context = multiprocessing.get_context('fork')
+    tasks = [
+        (options.seed + i, options.requests, options.write_share,
+         post_ids, user_ids[i % len(user_ids)])
+        for i in range(options.workers)
+    ]
+    started = time.perf_counter()
+    with context.Pool(options.workers) as pool:
+        results = [row for chunk in pool.map(worker, tasks) for row in chunk]
+    elapsed = time.perf_counter() - started
+    errors = Counter(error for _, _, error in results if error)
+    report = {
+        'requests': len(results),
+        'errors': sum(errors.values()),
+        'rps': round(len(results) / elapsed, 1),
+    }
+    for kind in ('read', 'write'):
+        timings = [ms for row_kind, ms, _ in results if row_kind == kind]
+        for share in (0.50, 0.95, 0.99):
+            report[f'{kind}_p{int(share * 100)}_ms'] = (
+                round(percentile(timings, share), 1) if timings else None
+            )
+    return report, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200,
+                        help='Запросов на один процесс.')
+    parser.add_argument('--write-share', type=float, default=0.3)
+    parser.add_argument('--posts', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--only', choices=PROFILES)
+    parser.add_argument('--db', default=default_db('bench_sqlite_locks'))
+    options = parser.parse_args()
+
+    connection = setup(options.db, relax=False)
+    # Строки лога медленных запросов заглушили бы отчёт
+    logging.disable(logging.WARNING)
+    create_db(connection, options.db, keepdb=False)
+    try:
+        from django.conf import settings
+        from django.core.management import call_command
+        from posts.models import Post, User
+        call_command(
+            'seed_yatube', users=options.workers, groups=5,
+            posts=options.posts, comments=options.posts,
+            seed=options.seed, image_ratio=0, stdout=io.StringIO()
+        )
+        post_ids = list(Post.objects.values_list('pk', flat=True))
+        user_ids = list(User.objects.values_list('pk', flat=True))
+        database = settings.DATABASES['default']
+        production = {
+            'SQLITE_PRAGMAS': settings.SQLITE_PRAGMAS,
+            'journal_mode': settings.SQLITE_PRAGMAS['journal_mode'],
+            'CONN_MAX_AGE': database['CONN_MAX_AGE'],
+            'DB_WRITE_RETRIES': settings.DB_WRITE_RETRIES,
+            'transaction_mode': database['OPTIONS'].get('transaction_mode'),
+        }
+        for name in PROFILES:
+            if options.only and name != options.only:
+                continue
+            apply_profile(profile_settings(name, production))
+            report, errors = run_profile(options, post_ids, user_ids)
+            print(name)
+            for key, value in report.items():
+                print(f'  {key:<14}{value}')
+            for error, count in errors.most_common():
+                print(f'  {count:>6} × {error}')
+    finally:
+        apply_profile(profile_settings('default', None))
+        destroy_db(connection, options.db, keepdb=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""
+Лента подписок: раскладка при публикации против сборки при чтении.
+
+Создаёт отдельную базу (по умолчанию benchmarks/bench_timeline.sqlite3)
+и меряет обе стороны posts.timeline:
+
+* запись — fan_out() нового поста автора с N подписчиками, когда пост
+  раскладывается по лентам и когда автор выше TIMELINE_FANOUT_LIMIT;
+* чтение — первая страница ленты читателя, подписанного на K авторов,
+  из разложенных записей и из постов авторов напрямую.
+
+    python benchmarks/bench_timeline.py --followers 1000 10000 100000
+    python benchmarks/bench_timeline.py --keepdb --json results.json
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from common import create_db, default_db, destroy_db, setup
+
+BATCH_SIZE = 20000
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+# Автор, на которого подписываются N читателей при замере записи
+STAR = 1
+# Без раскладки и с раскладкой любого автора
+PULL_ALL, PUSH_ALL = -1, 10 ** 9
+
+
+def insert(cursor, sql, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            cursor.executemany(sql, batch)
+            batch = []
+    if batch:
+        cursor.executemany(sql, batch)
+
+
+def seed(connection, options):
+    """Сырые executemany: пользователи и посты без сигналов ORM."""
+    from django.db import transaction
+    rnd = random.Random(options.seed)
+    users, posts = options.users, options.posts
+    with transaction.atomic(), connection.cursor() as cursor:
+        insert(cursor, (
+            'INSERT INTO auth_user (id, password, is_superuser, username, '
+            'first_name, last_name, email, is_staff, is_active, date_joined) '
+            "VALUES (%s, '', 0, %s, '', '', '', 0, 1, %s)"
+        ), ((i, f'user{i}', START) for i in range(1, users + 1)))
+        insert(cursor, (
+            'INSERT INTO posts_post (id, text, pub_date, author_id, '
+            'group_id, image, comments_count) '
+            "VALUES (%s, %s, %s, %s, NULL, '', 0)"
+        ), ((
+            i, f'Пост {i}', START + timedelta(seconds=i * 30),
+            rnd.randint(1, users),
+        ) for i in range(1, posts + 1)))
+        cursor.execute(
+            'INSERT INTO posts_authorstats '
+            '(author_id, posts_count, followers_count) '
+            'SELECT id, 0, 0 FROM auth_user'
+        )
+        cursor.execute('ANALYZE')
+
+
+def set_followers(cursor, author_id, count):
+    """Ровно `count` подписчиков у автора и тот же счётчик в статистике."""
+    cursor.execute(
+        'DELETE FROM posts_follow WHERE author_id = %s', [author_id]
+    )
+    insert(cursor, (
+        'INSERT INTO posts_follow (user_id, author_id) VALUES (%s, %s)'
+    ), ((user_id, author_id) for user_id in range(
+        author_id + 1, author_id + count + 1
+    )))
+    cursor.execute(
+        'UPDATE posts_authorstats SET followers_count = %s '
+        'WHERE author_id = %s', [count, author_id]
+    )
+
+
+def measure_writes(connection, options):
+    from django.db import transaction
+    from django.test import override_settings
+    from posts.models import Post, TimelineEntry
+    from posts.timeline import fan_out
+    results = {}
+    post_id = options.posts
+    for followers in sorted(options.followers):
+        with connection.cursor() as cursor:
+            set_followers(cursor, STAR, followers)
+        row = {}
+        for name, limit in (('push', PUSH_ALL), ('pull', PULL_ALL)):
+            timings = []
+            for _ in range(options.write_repeat):
+                post_id += 1
+                post = Post(
+                    pk=post_id, text='Новый пост', author_id=STAR,
+                    pub_date=START + timedelta(seconds=post_id * 30)
+                )
+                Post.objects.bulk_create([post])
+                with override_settings(TIMELINE_FANOUT_LIMIT=limit):
+                    started = time.perf_counter()
+                    with transaction.atomic():
+                        fan_out(post)
+                    timings.append((time.perf_counter() - started) * 1000)
+                TimelineEntry.objects.filter(post_id=post_id).delete()
+            row[name] = {
+                'median_ms': round(statistics.median(timings), 3),
+                'max_ms': round(max(timings), 3),
+            }
+        results[followers] = row
+    return results
+
+
+def in_list(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def follow_authors(connection, options, following):
+    """Читатели-образцы подписываются на `following` случайных авторов."""
+    from django.db import transaction
+    rnd = random.Random(options.seed + following)
+    authors = range(2, options.users + 1)
+    readers = list(range(
+        options.users - options.readers + 1, options.users + 1
+    ))
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table in ('posts_follow', 'posts_timelineentry'):
+            cursor.execute(
+                f'DELETE FROM {table} WHERE user_id IN ({in_list(readers)})',
+                readers
+            )
+        insert(cursor, (
+            'INSERT OR IGNORE INTO posts_follow (user_id, author_id) '
+            'VALUES (%s, %s)'
+        ), (
+            (reader, author) for reader in readers
+            for author in rnd.sample(authors, following)
+        ))
+        cursor.execute('ANALYZE')
+    return readers
+
+
+def materialize(connection, readers):
+    """Разложенные ленты читателей: как после backfill() каждой подписки."""
+    from django.conf import settings
+    from django.db import transaction
+    from posts.timeline import trim
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO posts_timelineentry '
+            '(user_id, post_id, author_id, pub_date) '
+            'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+            'FROM posts_follow follow JOIN posts_post post '
+            'ON post.author_id = follow.author_id '
+            f'WHERE follow.user_id IN ({in_list(readers)})', readers
+        )
+        trim(readers, settings.TIMELINE_LENGTH)
+        cursor.execute('ANALYZE')
+
+
+def first_pages(users, limit, repeat):
+    from django.conf import settings
+    from django.test import override_settings
+    from posts.timeline import TimelinePaginator
+    timings = []
+    with override_settings(TIMELINE_FANOUT_LIMIT=limit):
+        for i in range(repeat):
+            started = time.perf_counter()
+            list(TimelinePaginator(
+                users[i % len(users)], settings.PAGINATOR_COUNT
+            ).get_page())
+            timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def measure_reads(connection, options):
+    from posts.models import User
+    results = {}
+    for following in sorted(options.following):
+        readers = follow_authors(connection, options, following)
+        users = list(User.objects.filter(pk__in=readers))
+        # Сборка при чтении — по пустым лентам, раскладка — по полным
+        pull = first_pages(users, PULL_ALL, options.repeat)
+        materialize(connection, readers)
+        results[following] = {
+            'push': first_pages(users, PUSH_ALL, options.repeat),
+            'pull': pull,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=200000)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument(
+        '--followers', type=int, nargs='+', default=[1000, 10000, 100000],
+        help='Сколько подписчиков у автора при замере записи'
+    )
+    parser.add_argument(
+        '--following', type=int, nargs='+', default=[10, 100, 1000],
+        help='На скольких авторов подписан читатель при замере чтения'
+    )
+    parser.add_argument('--readers', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--write-repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--db', default=default_db('bench_timeline'))
+    parser.add_argument('--keepdb', action='store_true')
+    parser.add_argument('--json', help='Куда сохранить результаты')
+    options = parser.parse_args()
+    if max(options.followers) >= options.users:
+        parser.error('--followers должно быть меньше --users')
+
+    connection = setup(options.db)
+    seeded = create_db(connection, options.db, options.keepdb)
+    try:
+        if not seeded:
+            started = time.perf_counter()
+            seed(connection, options)
+            print(f'Заполнение: {time.perf_counter() - started:.1f} с')
+        report = {'options': vars(options)}
+        report['write'] = measure_writes(connection, options)
+        report['read'] = measure_reads(connection, options)
+    finally:
+        destroy_db(connection, options.db, options.keepdb)
+
+    print('\n== Публикация поста (fan_out), мс, медиана')
+    for followers, row in report['write'].items():
+        print(f'   {followers} подписчиков: раскладка '
+              f'{row["push"]["median_ms"]}, без раскладки '
+              f'{row["pull"]["median_ms"]}')
+    print('\n== Первая страница ленты, мс, медиана')
+    for following, row in report['read'].items():
+        print(f'   {following} подписок: разложенная '
+              f'{row["push"]["median_ms"]}, сборка при чтении '
+              f'{row["pull"]["median_ms"]}')
+    if options.json:
+        with open(options.json, 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
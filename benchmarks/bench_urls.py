@@ -0,0 +1,189 @@
+"""
+Задержки и пропускная способность страниц Yatube через настоящий URLconf.
+
+Заполняет одноразовую базу командой seed_yatube, прогоняет каждую
+страницу через django.test.Client и печатает rps, p50/p95/p99, число
+SQL-запросов и размер ответа. Результат сохраняется в JSON, два файла
+сравниваются через --compare:
+
+    python benchmarks/bench_urls.py --json before.json
+    python benchmarks/bench_urls.py --json after.json --compare before.json
+"""
+import argparse
+import io
+import json
+import math
+import statistics
+import subprocess
+import time
+from datetime import datetime
+
+from common import BASE_DIR, create_db, default_db, destroy_db, setup
+
+FIELDS = ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries', 'bytes')
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def targets():
+    """(имя, метод, адрес, нужен ли вход, данные формы)."""
+    from django.conf import settings
+    from django.urls import reverse
+    from posts.models import AuthorStats, Group, Post
+    author = AuthorStats.objects.select_related('author').order_by(
+        '-posts_count'
+    ).first().author
+    group = Group.objects.order_by('-posts_count').first()
+    post = Post.objects.order_by('-comments_count').first()
+    deep_page = max(1, Post.objects.count() // settings.PAGINATOR_COUNT // 2)
+    return [
+        ('index', 'get', reverse('posts:index'), False, None),
+        ('index_deep', 'get',
+         f"{reverse('posts:index')}?page={deep_page}", False, None),
+        ('posts_slug', 'get',
+         reverse('posts:posts_slug', args=[group.slug]), False, None),
+        ('profile', 'get',
+         reverse('posts:profile', args=[author.username]), False, None),
+        ('post_detail', 'get',
+         reverse('posts:post_detail', args=[post.pk]), False, None),
+        ('api_index', 'get', reverse('posts:api_index'), False, None),
+        ('api_posts_slug', 'get',
+         reverse('posts:api_posts_slug', args=[group.slug]), False, None),
+        ('api_profile', 'get',
+         reverse('posts:api_profile', args=[author.username]), False, None),
+        ('api_post_detail', 'get',
+         reverse('posts:api_post_detail', args=[post.pk]), False, None),
+        ('post_create_form', 'get',
+         reverse('posts:post_create'), True, None),
+        ('post_create', 'post', reverse('posts:post_create'), True,
+         {'text': 'Пост из бенчмарка', 'group': group.pk}),
+        ('add_comment', 'post',
+         reverse('posts:add_comment', args=[post.pk]), True,
+         {'text': 'Комментарий из бенчмарка'}),
+        ('about_author', 'get', reverse('about:author'), False, None),
+        ('about_tech', 'get', reverse('about:tech'), False, None),
+    ], author
+
+
+def run_target(client, method, url, data, options):
+    from django.core.cache import cache
+    from django.db import connection
+    from core.decorators import QueryCounter
+    send = getattr(client, method)
+    for _ in range(options.warmup):
+        send(url, data)
+    timings, queries, sizes = [], [], []
+    started = time.perf_counter()
+    for _ in range(options.requests):
+        if options.cold:
+            cache.clear()
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            request_started = time.perf_counter()
+            response = send(url, data)
+            timings.append((time.perf_counter() - request_started) * 1000)
+        queries.append(len(counter.queries))
+        sizes.append(len(response.content))
+    elapsed = time.perf_counter() - started
+    return {
+        'status': response.status_code,
+        'rps': round(options.requests / elapsed, 1),
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries': max(queries),
+        'bytes': round(statistics.mean(sizes)),
+    }
+
+
+def print_report(results, baseline=None):
+    header = f'{"страница":<18}' + ''.join(f'{name:>12}' for name in FIELDS)
+    print(header)
+    for name, result in results.items():
+        line = f'{name:<18}' + ''.join(
+            f'{result[field]:>12}' for field in FIELDS
+        )
+        print(line)
+        if baseline and name in baseline:
+            print(f'{"  было":<18}' + ''.join(
+                f'{baseline[name][field]:>12}' for field in FIELDS
+            ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=50)
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument(
+        '--cold', action='store_true',
+        help='Очищать кэш перед каждым запросом.'
+    )
+    parser.add_argument(
+        '--only', nargs='*', help='Прогнать только эти страницы.'
+    )
+    parser.add_argument('--db', default=default_db('bench_urls'))
+    parser.add_argument('--keepdb', action='store_true')
+    parser.add_argument('--json', help='Куда сохранить результаты')
+    parser.add_argument('--compare', help='JSON прошлого прогона')
+    options = parser.parse_args()
+
+    connection = setup(options.db)
+    seeded = create_db(connection, options.db, options.keepdb)
+    try:
+        from django.core.management import call_command
+        from django.test import Client
+        if not seeded:
+            call_command(
+                'seed_yatube', users=options.users, groups=options.groups,
+                posts=options.posts, comments=options.comments,
+                seed=options.seed, image_ratio=0, stdout=io.StringIO()
+            )
+        pages, author = targets()
+        guest, member = Client(), Client()
+        member.force_login(author)
+        results = {}
+        for name, method, url, login, data in pages:
+            if options.only and name not in options.only:
+                continue
+            client = member if login else guest
+            results[name] = run_target(client, method, url, data, options)
+    finally:
+        destroy_db(connection, options.db, options.keepdb)
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as source:
+            baseline = json.load(source)['results']
+    print_report(results, baseline)
+    if options.json:
+        with open(options.json, 'w') as output:
+            json.dump({
+                'revision': git_revision(),
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'options': vars(options),
+                'results': results,
+            }, output, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
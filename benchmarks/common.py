@@ -0,0 +1,60 @@
+"""Общая подготовка бенчмарков: Django и одноразовая база SQLite."""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, 'yatube'))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+def relax_durability(sender, connection, **kwargs):
+    # База одноразовая: fsync на каждый коммит только мешает заполнению
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous = OFF')
+            cursor.execute('PRAGMA journal_mode = MEMORY')
+
+
+def setup(db_name, relax=True):
+    """
+    Настраивает Django на отдельную базу бенчмарка. relax=False оставляет
+    журнал и синхронизацию такими, как в настройках проекта.
+    """
+    settings.DEBUG = False
+    settings.DATABASES['default']['TEST'] = {'NAME': db_name}
+    django.setup()
+    # Свой кэш на прогон: кэш разработчика не трогаем и не читаем
+    from core.cache import isolated_caches
+    cache_dir = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, cache_dir, ignore_errors=True)
+    settings.CACHES = isolated_caches(cache_dir)
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+    if relax:
+        connection_created.connect(relax_durability)
+    return connection
+
+
+def create_db(connection, db_name, keepdb):
+    """Создаёт базу и сообщает, есть ли в ней уже данные."""
+    exists = keepdb and os.path.exists(db_name)
+    connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, keepdb=keepdb
+    )
+    from posts.models import Post
+    return exists and Post.objects.exists()
+
+
+def destroy_db(connection, db_name, keepdb):
+    if not keepdb:
+        connection.creation.destroy_test_db(db_name, verbosity=0)
+
+
+def default_db(name):
+    return os.path.join(BASE_DIR, 'benchmarks', f'{name}.sqlite3')
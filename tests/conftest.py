@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,16 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(settings, tmp_path):
+    """
+    Тесты пишут в свой кэш, а не в кэш разработчика. Миниатюры не
+    строятся: поток пула пережил бы тест, а сборка при рендере не
+    уложилась бы в бюджеты запросов.
+    """
+    from core.cache import isolated_caches
+    settings.CACHES = isolated_caches(str(tmp_path))
+    settings.THUMBNAIL_BUILD = False
+    settings.TIMELINE_BACKFILL_ASYNC = False
@@ -1,10 +1,18 @@
 from django.urls import path
+
+from core.pagecache import anonymous_page_cache
 from . import views
 
 
 app_name = 'about'
 
 urlpatterns = [
-    path('author/', views.AboutAuthorView.as_view(), name='author'),
-    path('tech/', views.AboutTechView.as_view(), name='tech'),
+    path(
+        'author/', anonymous_page_cache(views.AboutAuthorView.as_view()),
+        name='author'
+    ),
+    path(
+        'tech/', anonymous_page_cache(views.AboutTechView.as_view()),
+        name='tech'
+    ),
 ]
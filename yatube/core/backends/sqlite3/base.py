@@ -0,0 +1,23 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite с OPTIONS['transaction_mode'] из Django 5.1. При 'IMMEDIATE'
+    транзакция сразу берёт блокировку записи и ждёт её по busy_timeout.
+    С обычным BEGIN транзакция, которая сначала читала, в WAL получает
+    «database is locked» мгновенно, если другой писатель успел закоммитить.
+    Без OPTIONS режим задаёт только core.db.write_transaction().
+    """
+
+    transaction_mode = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.transaction_mode = params.pop('transaction_mode', None)
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            return super()._start_transaction_under_autocommit()
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,507 @@
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache.backends import locmem, memcached
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.functional import cached_property
+
+from . import timing
+
+MISSING = object()
+
+STATS_KEY = 'cache_stats'
+STATS_KINDS = ('hits', 'misses')
+PREFIX_PARTS = 3
+PREFIX_TOKEN = re.compile(r'[A-Za-z_-]+')
+PREFIX_SEPARATOR = re.compile(r'(:|\|\||\.)')
+
+
+def key_prefix(key):
+    """
+    Группа ключа для статистики: ведущие слова ключа до первой части
+    с цифрами (id, версия, хэш) — 'feed_version:group',
+    'template.cache.feed_page', 'sorl-thumbnail||image'.
+    """
+    parts = PREFIX_SEPARATOR.split(key)
+    prefix, taken = parts[0], 1
+    for separator, part in zip(parts[1::2], parts[2::2]):
+        if taken == PREFIX_PARTS or not PREFIX_TOKEN.fullmatch(part):
+            break
+        prefix += separator + part
+        taken += 1
+    return prefix
+
+
+class CacheStats:
+    """
+    Попадания и промахи по префиксам ключей. Счётчики копятся в процессе
+    и раз в CACHE_STATS_FLUSH_INTERVAL секунд прибавляются к общим
+    в самом кэше, так что на общем бэкенде видна сумма всех воркеров.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.flushed = time.monotonic()
+
+    def record(self, key, hit):
+        with self.lock:
+            self.counts[key_prefix(key), STATS_KINDS[not hit]] += 1
+            due = (
+                time.monotonic() - self.flushed
+                >= settings.CACHE_STATS_FLUSH_INTERVAL
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+            self.flushed = time.monotonic()
+        if not counts:
+            return
+        for (prefix, kind), count in counts.items():
+            key = f'{STATS_KEY}:{prefix}:{kind}'
+            try:
+                self.cache.incr(key, count)
+            except ValueError:
+                if not self.cache.add(key, count, None):
+                    self.cache.incr(key, count)
+        # Список префиксов переписывается целиком при каждом сбросе:
+        # потерянное в гонке добавление вернётся со следующим
+        prefixes = {prefix for prefix, _ in counts}
+        known = self.cache.get(f'{STATS_KEY}:prefixes') or set()
+        if not prefixes <= known:
+            self.cache.set(f'{STATS_KEY}:prefixes', known | prefixes, None)
+
+    def read(self):
+        """{префикс: (попадания, промахи)} по всем процессам."""
+        prefixes = sorted(self.cache.get(f'{STATS_KEY}:prefixes') or ())
+        values = self.cache.get_many([
+            f'{STATS_KEY}:{prefix}:{kind}'
+            for prefix in prefixes for kind in STATS_KINDS
+        ])
+        return {
+            prefix: tuple(
+                values.get(f'{STATS_KEY}:{prefix}:{kind}', 0)
+                for kind in STATS_KINDS
+            )
+            for prefix in prefixes
+        }
+
+    def reset(self):
+        prefixes = self.cache.get(f'{STATS_KEY}:prefixes') or ()
+        self.cache.delete_many([
+            f'{STATS_KEY}:{prefix}:{kind}'
+            for prefix in prefixes for kind in STATS_KINDS
+        ] + [f'{STATS_KEY}:prefixes'])
+        with self.lock:
+            self.counts.clear()
+
+
+class TimedCacheMixin:
+    """
+    Отмечает попадания и промахи get() и get_many() в счётчиках текущего
+    запроса и в статистике по префиксам ключей.
+    """
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, MISSING, version=version)
+        self.record(key, value is not MISSING)
+        return default if value is MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = super().get_many(keys, version=version)
+        for key in keys:
+            self.record(key, key in found)
+        return found
+
+    def record(self, key, hit):
+        if key.startswith(STATS_KEY):
+            return
+        timing.record_cache(hit)
+        self.stats.record(key, hit)
+
+    @cached_property
+    def stats(self):
+        return CacheStats(self)
+
+
+class LocMemCache(TimedCacheMixin, locmem.LocMemCache):
+    def get_many(self, keys, version=None):
+        # Базовый get_many() сам идёт через get(), который уже считает
+        return locmem.LocMemCache.get_many(self, keys, version=version)
+
+
+class SQLiteFileCache(BaseCache):
+    """
+    Кэш в файле SQLite, общий для всех процессов на машине: замена
+    Redis/memcached, когда их нет. LOCATION — путь к файлу, в
+    OPTIONS['TABLE'] — таблица, чтобы держать несколько кэшей в одном
+    файле. Целые числа хранятся как есть, чтобы incr() был одним
+    UPDATE, остальные значения — в pickle.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+    # Просроченные и лишние записи чистятся раз в столько set() процесса
+    cull_every = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        self.table = params.get('OPTIONS', {}).get('TABLE', 'cache')
+        self._local = threading.local()
+        self._sets = 0
+
+    @property
+    def _db(self):
+        # Своё соединение на поток; после fork — новое
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(
+                self.location, timeout=5, isolation_level=None,
+                check_same_thread=False
+            )
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('PRAGMA synchronous = NORMAL')
+            db.execute(
+                f'CREATE TABLE IF NOT EXISTS "{self.table}" ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+                ') WITHOUT ROWID'
+            )
+            db.execute(
+                f'CREATE INDEX IF NOT EXISTS "{self.table}_expires" '
+                f'ON "{self.table}" (expires)'
+            )
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dumps(self, value):
+        # bool — тоже int, но должен вернуться bool
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _loads(self, value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _select(self, db, key):
+        row = db.execute(
+            f'SELECT value FROM "{self.table}" '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone()
+        return MISSING if row is None else self._loads(row[0])
+
+    def get(self, key, default=None, version=None):
+        value = self._select(self._db, self._key(key, version))
+        return default if value is MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        rows = self._db.execute(
+            f'SELECT key, value FROM "{self.table}" '
+            f'WHERE key IN ({", ".join("?" * len(keys))}) '
+            'AND (expires IS NULL OR expires > ?)',
+            (*keys, time.time())
+        ).fetchall()
+        return {keys[key]: self._loads(value) for key, value in rows}
+
+    def has_key(self, key, version=None):
+        return self._db.execute(
+            f'SELECT 1 FROM "{self.table}" '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time())
+        ).fetchone() is not None
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._db.execute(
+            f'INSERT OR REPLACE INTO "{self.table}" (key, value, expires) '
+            'VALUES (?, ?, ?)',
+            (
+                self._key(key, version), self._dumps(value),
+                self.get_backend_timeout(timeout)
+            )
+        )
+        self._maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [
+            (self._key(key, version), self._dumps(value), expires)
+            for key, value in data.items()
+        ]
+        db = self._db
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.executemany(
+                f'INSERT OR REPLACE INTO "{self.table}" (key, value, expires) '
+                'VALUES (?, ?, ?)',
+                rows
+            )
+        self._maybe_cull()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Просроченная запись считается отсутствующей и перезаписывается
+        now = time.time()
+        cursor = self._db.execute(
+            f'INSERT INTO "{self.table}" (key, value, expires) '
+            'VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires '
+            'WHERE expires IS NOT NULL AND expires <= ?',
+            (
+                self._key(key, version), self._dumps(value),
+                self.get_backend_timeout(timeout), now
+            )
+        )
+        if cursor.rowcount:
+            self._maybe_cull()
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db
+        # fetchall(): иначе незавершённый UPDATE держит блокировку записи
+        rows = db.execute(
+            f'UPDATE "{self.table}" SET value = value + ? '
+            "WHERE key = ? AND typeof(value) = 'integer' "
+            'AND (expires IS NULL OR expires > ?) RETURNING value',
+            (delta, key, time.time())
+        ).fetchall()
+        if rows:
+            return rows[0][0]
+        # Нет ключа или число не целое (например, записано в pickle
+        # прежней версией): читаем и пишем в одной транзакции
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            value = self._select(db, key)
+            if value is MISSING:
+                raise ValueError(f"Key '{key}' not found")
+            value += delta
+            db.execute(
+                f'UPDATE "{self.table}" SET value = ? WHERE key = ?',
+                (self._dumps(value), key)
+            )
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._db.execute(
+            f'UPDATE "{self.table}" SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (
+                self.get_backend_timeout(timeout),
+                self._key(key, version), time.time()
+            )
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        cursor = self._db.execute(
+            f'DELETE FROM "{self.table}" WHERE key = ?',
+            (self._key(key, version),)
+        )
+        return cursor.rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._db.execute(
+                f'DELETE FROM "{self.table}" '
+                f'WHERE key IN ({", ".join("?" * len(keys))})',
+                keys
+            )
+
+    def clear(self):
+        self._db.execute(f'DELETE FROM "{self.table}"')
+
+    def close(self, **kwargs):
+        # Django закрывает кэши после каждого запроса; соединение с
+        # файлом дешевле держать открытым
+        pass
+
+    def _maybe_cull(self):
+        self._sets += 1
+        if self._sets % self.cull_every == 0:
+            self._cull()
+
+    def _cull(self):
+        db = self._db
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute(
+                f'DELETE FROM "{self.table}" WHERE expires <= ?',
+                (time.time(),)
+            )
+            count, = db.execute(
+                f'SELECT COUNT(*) FROM "{self.table}"'
+            ).fetchone()
+            if count > self._max_entries:
+                # Сначала уходят записи, которым и так скоро истекать
+                db.execute(
+                    f'DELETE FROM "{self.table}" WHERE key IN ('
+                    f'SELECT key FROM "{self.table}" '
+                    'ORDER BY expires IS NULL, expires LIMIT ?)',
+                    (max(count // self._cull_frequency, 1),)
+                )
+
+
+class RedisClientCache(BaseCache):
+    """
+    Адаптер к Redis, если он есть (нужен пакет redis). LOCATION — URL
+    вида redis://host:6379/0. Целые числа хранятся как есть, чтобы
+    incr() выполнялся на сервере, остальное — в pickle.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+
+    @cached_property
+    def _client(self):
+        try:
+            import redis
+        except ImportError as error:
+            raise ImproperlyConfigured(
+                'Для core.cache.RedisCache нужен пакет redis'
+            ) from error
+        return redis.Redis.from_url(self.location)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _ttl(self, timeout):
+        """Срок жизни в секундах; None — бессрочно, 0 — уже истёк."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return max(0, int(timeout))
+
+    def _dumps(self, value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _loads(self, data):
+        try:
+            return int(data)
+        except ValueError:
+            return pickle.loads(data)
+
+    def get(self, key, default=None, version=None):
+        data = self._client.get(self._key(key, version))
+        return default if data is None else self._loads(data)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        return {
+            keys[key]: self._loads(data)
+            for key, data in zip(keys, self._client.mget(list(keys)))
+            if data is not None
+        }
+
+    def has_key(self, key, version=None):
+        return bool(self._client.exists(self._key(key, version)))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        ttl = self._ttl(timeout)
+        if ttl == 0:
+            self._client.delete(key)
+        else:
+            self._client.set(key, self._dumps(value), ex=ttl)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        ttl = self._ttl(timeout)
+        pipeline = self._client.pipeline()
+        for key, value in data.items():
+            key = self._key(key, version)
+            if ttl == 0:
+                pipeline.delete(key)
+            else:
+                pipeline.set(key, self._dumps(value), ex=ttl)
+        pipeline.execute()
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        ttl = self._ttl(timeout)
+        if ttl == 0:
+            return False
+        return bool(self._client.set(
+            self._key(key, version), self._dumps(value), ex=ttl, nx=True
+        ))
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        if not self._client.exists(key):
+            raise ValueError(f"Key '{key}' not found")
+        return self._client.incr(key, delta)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        ttl = self._ttl(timeout)
+        if ttl is None:
+            return bool(self._client.persist(key))
+        return bool(self._client.expire(key, ttl))
+
+    def delete(self, key, version=None):
+        return bool(self._client.delete(self._key(key, version)))
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        if keys:
+            self._client.delete(*keys)
+
+    def clear(self):
+        self._client.flushdb()
+
+
+class SQLiteCache(TimedCacheMixin, SQLiteFileCache):
+    pass
+
+
+class RedisCache(TimedCacheMixin, RedisClientCache):
+    pass
+
+
+class MemcachedCache(TimedCacheMixin, memcached.PyLibMCCache):
+    """Адаптер к memcached через pylibmc."""
+
+
+def isolated_caches(directory):
+    """
+    CACHES для тестов и бенчмарков: те же псевдонимы и таблицы, но
+    в файле SQLite в `directory`, а не в кэше разработчика.
+    """
+    location = os.path.join(directory, 'cache.sqlite3')
+    return {
+        alias: {
+            **params,
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': location,
+        }
+        for alias, params in settings.CACHES.items()
+    }
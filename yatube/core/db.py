@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Применяет SQLITE_PRAGMAS к каждому новому соединению с SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def write_transaction(using=DEFAULT_DB_ALIAS):
+    """
+    transaction.atomic() для записи: в SQLite (core.backends.sqlite3)
+    начинается с BEGIN IMMEDIATE и сразу ждёт блокировку записи.
+    Остальные транзакции, в том числе get_or_create при чтении,
+    остаются отложенными и не занимают базу зря.
+    """
+    connection = connections[using]
+    if connection.in_atomic_block:
+        # Внешняя транзакция уже началась: режим не сменить
+        with transaction.atomic(using=using):
+            yield
+        return
+    connection.ensure_connection()
+    previous = getattr(connection, 'transaction_mode', None)
+    connection.transaction_mode = 'IMMEDIATE'
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        connection.transaction_mode = previous
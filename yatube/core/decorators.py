@@ -0,0 +1,121 @@
+import functools
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+
+from .db import write_transaction
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Вьюха сделала больше SQL-запросов, чем ей разрешено."""
+
+
+# Управление транзакцией и настройка нового соединения,
+# а не обращение к данным
+TRANSACTION_STATEMENTS = (
+    'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE', 'PRAGMA'
+)
+
+
+class QueryCounter:
+    """Обёртка `connection.execute_wrapper`, запоминающая SQL запросов."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.startswith(TRANSACTION_STATEMENTS):
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+
+def query_budget(limit):
+    """
+    Объявляет, сколько SQL-запросов может сделать вьюха вместе с рендером.
+    При превышении бросает `QueryBudgetExceeded`, если включён
+    QUERY_BUDGET_RAISE (разработка и тесты), иначе пишет предупреждение в лог.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                response = view(request, *args, **kwargs)
+            used = len(counter.queries)
+            if used > limit:
+                message = (
+                    f'{view.__module__}.{view.__name__}: {used} SQL-запросов '
+                    f'при бюджете {limit} ({request.method} {request.path})'
+                )
+                if settings.QUERY_BUDGET_RAISE:
+                    raise QueryBudgetExceeded(
+                        '\n'.join([message] + counter.queries)
+                    )
+                logger.warning(message, extra={'queries': counter.queries})
+            return response
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+def is_locked(error):
+    return 'locked' in str(error)
+
+
+def call_with_retries(func, *args, **kwargs):
+    """
+    Вызывает `func` в write_transaction() и повторяет, если SQLite ответил
+    «database is locked». Каждая попытка идёт в своей транзакции, так что
+    неудачная не оставляет полузаписанных данных. Пауза растёт вдвое
+    до DB_WRITE_RETRY_MAX_DELAY, со случайной долей, чтобы писатели
+    не просыпались разом. DB_WRITE_RETRIES = 0 выключает и повторы,
+    и транзакцию.
+
+    Откатывается только база: файлы, записанные в хранилище, остаются,
+    поэтому сохранять их нужно до вызова.
+    """
+    if not settings.DB_WRITE_RETRIES:
+        return func(*args, **kwargs)
+    attempt = 0
+    while True:
+        try:
+            with write_transaction():
+                return func(*args, **kwargs)
+        except OperationalError as error:
+            # Во внешней транзакции снимок уже устарел: повтор не поможет
+            if (
+                not is_locked(error)
+                or attempt >= settings.DB_WRITE_RETRIES
+                or connection.in_atomic_block
+            ):
+                raise
+        delay = min(
+            settings.DB_WRITE_RETRY_DELAY * 2 ** attempt,
+            settings.DB_WRITE_RETRY_MAX_DELAY,
+        )
+        attempt += 1
+        logger.info(
+            '%s: база занята, попытка %s через %.3f с',
+            func.__name__, attempt, delay
+        )
+        time.sleep(random.uniform(delay / 2, delay))
+
+
+def retry_on_locked(view):
+    """
+    call_with_retries() для пишущих запросов вьюхи. GET и HEAD идут
+    без транзакции: показ формы не должен брать блокировку записи.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        return call_with_retries(view, request, *args, **kwargs)
+    return wrapper
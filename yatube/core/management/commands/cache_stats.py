@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Попадания и промахи кэшей по префиксам ключей, '
+        'сумма по всем процессам, пишущим в общий кэш.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить статистику после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        for alias in settings.CACHES:
+            cache = caches[alias]
+            stats = getattr(cache, 'stats', None)
+            if stats is None:
+                continue
+            stats.flush()
+            self.stdout.write(f'{alias}:')
+            for prefix, (hits, misses) in stats.read().items():
+                total = hits + misses
+                self.stdout.write('  {}: hit={} miss={} ({:.0%})'.format(
+                    prefix, hits, misses, hits / total if total else 0
+                ))
+            if options['reset']:
+                stats.reset()
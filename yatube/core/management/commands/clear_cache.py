@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Очищает все кэши из CACHES. Нужна после подмены базы (новая '
+        'база, восстановление из копии): общий кэш её переживает.'
+    )
+
+    def handle(self, *args, **options):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+            self.stdout.write(f'{alias}: очищен')
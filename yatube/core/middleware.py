@@ -0,0 +1,68 @@
+import logging
+import random
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import timing
+
+logger = logging.getLogger(__name__)
+
+
+class ServerTimingMiddleware:
+    """
+    Меряет время запроса, SQL, рендер шаблонов (бэкенд
+    core.timing.DjangoTemplates), попадания в кэш и в готовые миниатюры.
+    Отдаёт их в заголовке Server-Timing и строкой лога; медленные
+    запросы с долей SERVER_TIMING_SLOW_SAMPLE логируются вместе с SQL.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = timing.RequestTimings(settings.SERVER_TIMING_MAX_SQL)
+        timing.activate(timings)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            timing.deactivate()
+        self.report(request, response, timings)
+        return response
+
+    def report(self, request, response, timings):
+        data = timings.as_dict()
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={data["total_ms"]}',
+                f'sql;dur={data["sql_ms"]};desc="{data["sql_count"]} queries"',
+                f'tpl;dur={data["template_ms"]}',
+                f'cache;desc="hit={data["cache_hits"]} '
+                f'miss={data["cache_misses"]}"',
+                f'thumb;desc="hit={data["thumbnail_hits"]} '
+                f'miss={data["thumbnail_misses"]}"',
+            ])
+        extra = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **data,
+        }
+        message = ' '.join(f'{key}={value}' for key, value in extra.items())
+        if (
+            data['total_ms'] >= settings.SERVER_TIMING_SLOW_MS
+            and random.random() < settings.SERVER_TIMING_SLOW_SAMPLE
+        ):
+            logger.warning(
+                'slow %s\n%s', message, '\n'.join(
+                    f'{duration} ms: {sql}'
+                    for duration, sql in timings.queries
+                ),
+                extra={**extra, 'queries': timings.queries}
+            )
+        else:
+            logger.info(message, extra=extra)
@@ -0,0 +1,176 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+
+PAGE_KEY = 'page:{}'
+VERSION_KEY = 'surrogate:{}'
+
+
+def _new_version():
+    # Как у версий лент: от времени, чтобы вытесненный ключ не совпал
+    # со старыми страницами
+    return int(time.time() * 1000)
+
+
+def key_versions(keys):
+    """{суррогатный ключ: текущая версия}; недостающие версии создаются."""
+    found = cache.get_many([VERSION_KEY.format(key) for key in keys])
+    versions = {}
+    for key in keys:
+        version = found.get(VERSION_KEY.format(key))
+        if version is None:
+            version = _new_version()
+            if not cache.add(VERSION_KEY.format(key), version, None):
+                version = cache.get(VERSION_KEY.format(key), version)
+        versions[key] = version
+    return versions
+
+
+def purge(*keys):
+    """Сбрасывает все страницы, помеченные любым из ключей."""
+    for key in set(keys):
+        try:
+            cache.incr(VERSION_KEY.format(key))
+        except ValueError:
+            cache.set(VERSION_KEY.format(key), _new_version(), None)
+
+
+def tag_page(request, *keys):
+    """
+    Помечает кэшируемую страницу суррогатными ключами. Вызывать до
+    выборки данных: версии запоминаются сразу, и правка во время
+    рендера сбросит сохранённую страницу.
+    """
+    versions = getattr(request, 'page_versions', None)
+    if versions is not None:
+        versions.update(key_versions(keys))
+
+
+def page_validators(keys_func):
+    """
+    ETag из версий суррогатных ключей страницы для запросов мимо кэша
+    anonymous_page_cache: вошедшим и при выключенном кэше. Совпал
+    If-None-Match — 304 без вьюхи. keys_func(request, *args, **kwargs)
+    возвращает те же ключи, что вьюха передаёт в tag_page(), или None,
+    если страницы нет. Last-Modified не ставится: purge() прибавляет
+    к версии единицу, и по версиям время правки не узнать.
+    """
+    def etag(request, *args, **kwargs):
+        # Анонимную страницу из кэша валидирует хэш её содержимого
+        if getattr(request, 'page_versions', None) is not None:
+            return None
+        keys = keys_func(request, *args, **kwargs)
+        if keys is None:
+            return None
+        versions = key_versions(keys)
+        # Страница своя у каждого читателя, а в форме — его CSRF-токен
+        state = [
+            request.user.pk, request.META.get('CSRF_COOKIE'),
+            sorted(versions.items())
+        ]
+        return hashlib.md5(repr(state).encode()).hexdigest()
+    return condition(etag_func=etag)
+
+
+def page_key(request):
+    url = f'{request.get_host()}{request.get_full_path()}'
+    return PAGE_KEY.format(hashlib.md5(url.encode()).hexdigest())
+
+
+def add_proxy_headers(response, keys):
+    if settings.PAGE_CACHE_PROXY_HEADERS:
+        patch_cache_control(
+            response, public=True, max_age=0,
+            s_maxage=settings.PAGE_CACHE_PROXY_MAX_AGE
+        )
+        response['Surrogate-Key'] = ' '.join(sorted(keys))
+    return response
+
+
+def add_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def is_cacheable(response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and 'private' not in response.get('Cache-Control', '')
+    )
+
+
+def anonymous_page_cache(view):
+    """
+    Кэш всей страницы для анонимов. Вьюха помечает страницу ключами
+    через tag_page(); страница отдаётся из кэша, пока версии всех её
+    ключей не сменились (purge()). Без ключей живёт PAGE_CACHE_TIMEOUT.
+
+    ETag (хэш содержимого) и Last-Modified (время рендера) верны, пока
+    жива запись: на совпавший условный GET отвечаем 304 прямо из кэша,
+    без вьюхи и шаблонов.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            not settings.PAGE_CACHE_ENABLED
+            or request.method not in ('GET', 'HEAD')
+        ):
+            return view(request, *args, **kwargs)
+        if request.user.is_authenticated:
+            response = view(request, *args, **kwargs)
+            if settings.PAGE_CACHE_PROXY_HEADERS:
+                patch_cache_control(response, private=True)
+            return response
+        key = page_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            versions, content_type, content, etag, last_modified = entry
+            if key_versions(list(versions)) == versions:
+                response = get_conditional_response(
+                    request, etag=etag, last_modified=last_modified
+                ) or HttpResponse(content, content_type=content_type)
+                add_validators(response, etag, last_modified)
+                return add_proxy_headers(response, versions)
+        request.page_versions = {}
+        response = view(request, *args, **kwargs)
+        if not is_cacheable(response):
+            return response
+        add_proxy_headers(response, request.page_versions)
+        if getattr(response, 'is_rendered', True):
+            return store_page(request, key, entry, response)
+        # TemplateResponse (about) рендерится уже после вьюхи
+        response.add_post_render_callback(
+            lambda response: store_page(request, key, entry, response)
+        )
+        return response
+    return wrapper
+
+
+def store_page(request, key, old_entry, response):
+    """Кладёт отрендеренную страницу в кэш и ставит ей валидаторы."""
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    # Тот же ответ сохраняет прежнюю дату, новый получает дату строго
+    # позже: Last-Modified точен лишь до секунды
+    _, _, _, old_etag, old_modified = old_entry or (None,) * 4 + (0,)
+    if etag == old_etag:
+        last_modified = old_modified
+    else:
+        last_modified = max(int(time.time()), old_modified + 1)
+    cache.set(key, (
+        request.page_versions, response['Content-Type'], response.content,
+        etag, last_modified
+    ), settings.PAGE_CACHE_TIMEOUT)
+    add_validators(response, etag, last_modified)
+    return get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=response
+    )
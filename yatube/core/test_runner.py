@@ -0,0 +1,29 @@
+import shutil
+import tempfile
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .cache import isolated_caches
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Тесты пишут в свой временный кэш, а не в кэш разработчика.
+    Миниатюры и ленты подписок дописываются сразу: поток пула пережил
+    бы тест и его override_settings (MEDIA_ROOT, база).
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_dir = tempfile.mkdtemp()
+        self.test_settings = override_settings(
+            CACHES=isolated_caches(self.cache_dir), THUMBNAIL_ASYNC=False,
+            TIMELINE_BACKFILL_ASYNC=False
+        )
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
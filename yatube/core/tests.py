@@ -0,0 +1,247 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, TestCase, TransactionTestCase, override_settings
+)
+from django.test.utils import CaptureQueriesContext
+
+from .cache import SQLiteCache, key_prefix
+from .db import write_transaction
+from .decorators import QueryBudgetExceeded, query_budget, retry_on_locked
+
+User = get_user_model()
+
+CACHE_DIR = tempfile.mkdtemp()
+CACHE_FILE = os.path.join(CACHE_DIR, 'cache.sqlite3')
+
+
+@query_budget(1)
+def two_queries_view(request):
+    User.objects.count()
+    User.objects.exists()
+    return HttpResponse()
+
+
+class QueryBudgetTest(TestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    @override_settings(QUERY_BUDGET_RAISE=True)
+    def test_over_budget_raises(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            two_queries_view(self.request)
+
+    @override_settings(QUERY_BUDGET_RAISE=False)
+    def test_over_budget_logs(self):
+        with self.assertLogs('core.decorators', 'WARNING') as logs:
+            self.assertEqual(two_queries_view(self.request).status_code, 200)
+        self.assertIn('two_queries_view', logs.output[0])
+        self.assertEqual(two_queries_view.query_budget, 1)
+
+
+class ServerTimingMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_header_reports_hot_paths(self):
+        self.client.get('/')
+        header = self.client.get('/')['Server-Timing']
+        for metric in [
+            'total;dur=', 'sql;dur=', 'tpl;dur=', 'cache;desc=', 'thumb;desc='
+        ]:
+            with self.subTest(metric=metric):
+                self.assertIn(metric, header)
+        self.assertNotIn('tpl;dur=0.0,', header)
+        # Второй раз лента берётся из кэша фрагментов
+        self.assertNotIn('cache;desc="hit=0 ', header)
+
+    @override_settings(SERVER_TIMING_SLOW_MS=0, SERVER_TIMING_SLOW_SAMPLE=1)
+    def test_slow_request_logged_with_sql(self):
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get('/')
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/'))
+
+
+@override_settings(DB_WRITE_RETRIES=2, DB_WRITE_RETRY_DELAY=0)
+class RetryOnLockedTest(TransactionTestCase):
+    def setUp(self):
+        self.request = RequestFactory().post('/')
+        self.calls = 0
+
+    def view(self, errors):
+        @retry_on_locked
+        def view(request):
+            self.calls += 1
+            User.objects.create(username=f'user{self.calls}')
+            if self.calls <= errors:
+                raise OperationalError('database is locked')
+            return HttpResponse()
+        return view
+
+    def test_locked_write_retried_in_fresh_transaction(self):
+        self.assertEqual(self.view(2)(self.request).status_code, 200)
+        self.assertEqual(self.calls, 3)
+        # Неудачные попытки откатились целиком
+        self.assertEqual(
+            list(User.objects.values_list('username', flat=True)), ['user3']
+        )
+
+    def test_gives_up_after_retries(self):
+        with self.assertRaises(OperationalError):
+            self.view(3)(self.request)
+        self.assertEqual(self.calls, 3)
+        self.assertFalse(User.objects.exists())
+
+    def test_get_not_wrapped_in_transaction(self):
+        @retry_on_locked
+        def view(request):
+            self.assertFalse(connection.in_atomic_block)
+            return HttpResponse()
+        view(RequestFactory().get('/'))
+
+    def test_other_errors_not_retried(self):
+        @retry_on_locked
+        def view(request):
+            self.calls += 1
+            raise OperationalError('no such table: missing')
+        with self.assertRaises(OperationalError):
+            view(self.request)
+        self.assertEqual(self.calls, 1)
+
+
+class SQLiteProfileTest(TransactionTestCase):
+    def test_pragmas_applied_to_new_connection(self):
+        connection.close()
+        with connection.cursor() as cursor:
+            for pragma in ('cache_size', 'busy_timeout', 'synchronous'):
+                with self.subTest(pragma=pragma):
+                    cursor.execute(f'PRAGMA {pragma}')
+                    self.assertEqual(cursor.fetchone()[0], {
+                        'cache_size': -64 * 1024,
+                        'busy_timeout': 5000,
+                        'synchronous': 1,
+                    }[pragma])
+
+    def test_write_transactions_take_write_lock_upfront(self):
+        cases = [
+            [write_transaction, 'BEGIN IMMEDIATE'],
+            [transaction.atomic, 'BEGIN'],
+        ]
+        for block, begin in cases:
+            with self.subTest(begin=begin):
+                with CaptureQueriesContext(connection) as queries:
+                    with block():
+                        User.objects.exists()
+                self.assertEqual(queries.captured_queries[0]['sql'], begin)
+
+
+def shared_cache(**options):
+    return SQLiteCache(CACHE_FILE, {'OPTIONS': options})
+
+
+def bump_counter(times):
+    cache = shared_cache()
+    for _ in range(times):
+        cache.incr('counter')
+
+
+@override_settings(CACHE_STATS_FLUSH_INTERVAL=0)
+class SQLiteCacheTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.cache = shared_cache()
+        self.cache.clear()
+
+    def test_values_shared_between_instances(self):
+        other = shared_cache()
+        self.cache.set('feed', {'posts': [1, 2]})
+        self.assertEqual(other.get('feed'), {'posts': [1, 2]})
+        self.assertFalse(other.add('feed', 'other'))
+        other.delete('feed')
+        self.assertIsNone(self.cache.get('feed'))
+
+    def test_expired_entries_are_missing(self):
+        self.cache.set('gone', 1, -1)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertFalse(self.cache.has_key('gone'))
+        self.assertTrue(self.cache.add('gone', 2))
+        self.assertEqual(self.cache.get('gone'), 2)
+
+    def test_many(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2}
+        )
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+        with multiprocessing.get_context('fork').Pool(4) as pool:
+            pool.map(bump_counter, [25] * 4)
+        self.assertEqual(self.cache.get('counter'), 100)
+
+    def test_incr_keeps_types(self):
+        cases = [
+            ['number', 1, 2],
+            ['flag', True, None],
+            ['pickled', 1.5, 2.5],
+        ]
+        for key, value, incremented in cases:
+            with self.subTest(key=key):
+                self.cache.set(key, value)
+                self.assertIs(type(self.cache.get(key)), type(value))
+                if incremented is not None:
+                    self.assertEqual(self.cache.incr(key), incremented)
+                    self.assertEqual(self.cache.get(key), incremented)
+
+    def test_culls_over_max_entries(self):
+        cache = shared_cache(MAX_ENTRIES=10, TABLE='small')
+        cache.clear()
+        cache.cull_every = 1
+        for number in range(20):
+            cache.set(f'key:{number}', number)
+        self.assertLessEqual(len(cache.get_many(
+            f'key:{number}' for number in range(20)
+        )), 10)
+
+    def test_stats_by_key_prefix(self):
+        self.cache.stats.reset()
+        self.cache.set('feed_version:index', 1)
+        self.cache.get('feed_version:index')
+        self.cache.get('feed_version:group:3')
+        self.cache.get_many(['template.cache.feed_page.0a1b', 'x'])
+        self.assertEqual(shared_cache().stats.read(), {
+            'feed_version:index': (1, 0),
+            'feed_version:group': (0, 1),
+            'template.cache.feed_page': (0, 1),
+            'x': (0, 1),
+        })
+
+    def test_key_prefix(self):
+        for key, prefix in [
+            ('feed_version:profile:12', 'feed_version:profile'),
+            ('template.cache.feed_page.9e107d9d', 'template.cache.feed_page'),
+            ('sorl-thumbnail||image||3f2a', 'sorl-thumbnail||image'),
+            ('views.decorators.cache.page.x', 'views.decorators.cache'),
+        ]:
+            with self.subTest(key=key):
+                self.assertEqual(key_prefix(key), prefix)
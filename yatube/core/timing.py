@@ -0,0 +1,115 @@
+import threading
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends import django as backends
+from django.template.backends.django import Template
+
+_local = threading.local()
+
+
+class RequestTimings:
+    """Счётчики горячих участков одного запроса."""
+
+    def __init__(self, max_sql=50):
+        self.started = time.perf_counter()
+        self.max_sql = max_sql
+        self.sql_ms = 0.0
+        self.sql_count = 0
+        self.template_ms = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.thumbnail_hits = 0
+        self.thumbnail_misses = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        # Обёртка connection.execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.sql_ms += duration
+            self.sql_count += 1
+            if len(self.queries) < self.max_sql:
+                self.queries.append((round(duration, 3), sql))
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def as_dict(self):
+        return {
+            'total_ms': round(self.total_ms, 3),
+            'sql_ms': round(self.sql_ms, 3),
+            'sql_count': self.sql_count,
+            'template_ms': round(self.template_ms, 3),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'thumbnail_hits': self.thumbnail_hits,
+            'thumbnail_misses': self.thumbnail_misses,
+        }
+
+
+def current():
+    """Счётчики запроса, который обрабатывает этот поток, или None."""
+    return getattr(_local, 'timings', None)
+
+
+def activate(timings):
+    _local.timings = timings
+
+
+def deactivate():
+    _local.timings = None
+
+
+def record_cache(hit):
+    timings = current()
+    if timings is None:
+        return
+    if hit:
+        timings.cache_hits += 1
+    else:
+        timings.cache_misses += 1
+
+
+def record_thumbnails(hits=0, misses=0):
+    """Готовые миниатюры и те, что пришлось отправить на генерацию."""
+    timings = current()
+    if timings is not None:
+        timings.thumbnail_hits += hits
+        timings.thumbnail_misses += misses
+
+
+class TimedTemplate(Template):
+    """Шаблон, время рендера которого идёт в счётчики запроса."""
+
+    def render(self, context=None, request=None):
+        timings = current()
+        if timings is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings.template_ms += (time.perf_counter() - started) * 1000
+
+
+class DjangoTemplates(backends.DjangoTemplates):
+    """
+    Бэкенд Django-шаблонов, который меряет время их рендера.
+    Вложенные include идут мимо бэкенда и не считаются дважды.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            backends.reraise(exc, self)
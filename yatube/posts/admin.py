@@ -1,6 +1,105 @@
+import datetime
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.db import models
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import Truncator
 
+from . import search
 from .models import Post, Group
+from .paginator import EstimatedCountPaginator
+
+
+def next_period(date, kind):
+    if kind == 'year':
+        return date.replace(year=date.year + 1, month=1, day=1)
+    if kind == 'month':
+        return (date.replace(day=28) + datetime.timedelta(days=4)).replace(
+            day=1
+        )
+    return date + datetime.timedelta(days=1)
+
+
+def period_start(date, kind):
+    if kind == 'year':
+        return date.replace(month=1, day=1)
+    if kind == 'month':
+        return date.replace(day=1)
+    return date
+
+
+class IndexedDatesQuerySet(models.QuerySet):
+    """
+    dates() для date_hierarchy без DISTINCT по всей таблице: границы
+    берутся через MIN/MAX, затем на каждый год, месяц или день один
+    EXISTS по диапазону — всё это поиск по индексу на pub_date.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        # SQLite берёт MIN/MAX из индекса, только если агрегат в запросе
+        # один: date_hierarchy просит оба сразу и читал бы весь индекс
+        if args or len(kwargs) < 2 or not all(
+            isinstance(value, (models.Min, models.Max))
+            for value in kwargs.values()
+        ):
+            return super().aggregate(*args, **kwargs)
+        result = {}
+        for name, value in kwargs.items():
+            result.update(super().aggregate(**{name: value}))
+        return result
+
+    def dates(self, field_name, kind, order='ASC'):
+        bounds = self.aggregate(
+            first=models.Min(field_name), last=models.Max(field_name)
+        )
+        if bounds['first'] is None:
+            return []
+        first, last = (
+            timezone.localtime(bounds[key]).date()
+            for key in ('first', 'last')
+        )
+        dates = []
+        date = period_start(first, kind)
+        while date <= last:
+            end = next_period(date, kind)
+            if self.filter(**{
+                f'{field_name}__gte': self.as_datetime(date),
+                f'{field_name}__lt': self.as_datetime(end),
+            }).exists():
+                dates.append(date)
+            date = end
+        return dates if order == 'ASC' else dates[::-1]
+
+    @staticmethod
+    def as_datetime(date):
+        return timezone.make_aware(
+            datetime.datetime.combine(date, datetime.time())
+        )
+
+
+class GroupRawIdWidget(ForeignKeyRawIdWidget):
+    """Подпись группы из уже загруженного объекта, без запроса на строку."""
+    group = None
+
+    def label_and_url_for_value(self, value):
+        if self.group is None or str(self.group.pk) != str(value):
+            return super().label_and_url_for_value(value)
+        url = reverse(
+            f'{self.admin_site.name}:posts_group_change', args=[self.group.pk]
+        )
+        return Truncator(self.group).words(14), url
+
+
+class PostChangeListForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        widget = self.fields['group'].widget
+        if isinstance(widget, GroupRawIdWidget) and self.instance.group_id:
+            # Строки списка загружены с select_related('group')
+            widget.group = self.instance.group
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -12,10 +111,46 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    raw_id_fields = ('group',)
+    autocomplete_fields = ('author',)
     search_fields = ('text',)
+    # Оба фильтра по pub_date сводятся к диапазону по индексу
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        queryset = IndexedDatesQuerySet(self.model)
+        ordering = self.get_ordering(request)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        return queryset
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = GroupRawIdWidget(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using')
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице
+        if not search.enabled():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        if not search.match_expression(search_term):
+            return queryset, False
+        return queryset.filter(pk__in=search.matching_ids(search_term)), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
@@ -0,0 +1,216 @@
+"""
+JSON для мобильного клиента: те же ленты, что и HTML-страницы, но без
+шаблонов. Строки выбираются values() только с нужными полями, страницы
+идут по курсору, миниатюры — готовыми адресами, ответы — с ETag.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from core.decorators import query_budget
+from core.pagecache import anonymous_page_cache, tag_page
+from .cache import (
+    INDEX_FEED, author_key, feed_key, group_feed, group_key, post_key,
+    profile_feed
+)
+from .models import Comment, Group, Post, User
+from .paginator import (
+    AFTER, BEFORE, CursorPage, CursorPaginator, encode_token
+)
+from .thumbnails import page_thumbnails
+
+POST_FIELDS = (
+    'pk', 'text', 'pub_date', 'comments_count', 'image', 'author__username',
+    'author__first_name', 'author__last_name', 'group__slug', 'group__title',
+)
+COMMENT_FIELDS = ('pk', 'text', 'created', 'author__username')
+# Без пробелов и \u-экранов кириллицы: ответ заметно короче
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+# Бюджеты включают один запрос миниатюр страницы, как и у HTML-страниц
+
+
+class ValuesCursorPage(CursorPage):
+    """Страница выборки values(): курсор берётся из словаря строки."""
+
+    def cursor(self, row):
+        return encode_token(
+            row[self.paginator.field].isoformat(), row['pk']
+        )
+
+
+class ValuesCursorPaginator(CursorPaginator):
+    page_class = ValuesCursorPage
+
+
+def get_page(request, queryset, per_page, **kwargs):
+    return ValuesCursorPaginator(queryset, per_page, **kwargs).get_page(
+        request.GET.get(AFTER), request.GET.get(BEFORE)
+    )
+
+
+def cursor_url(request, name, cursor):
+    if cursor is None:
+        return None
+    return f'{request.path}?{urlencode({name: cursor})}'
+
+
+def page_data(request, page, items):
+    return {
+        'results': items,
+        'next': cursor_url(request, AFTER, page.next_cursor),
+        'previous': cursor_url(request, BEFORE, page.previous_cursor),
+    }
+
+
+def full_name(first_name, last_name):
+    return f'{first_name} {last_name}'.strip()
+
+
+def thumbnail_data(thumbnail):
+    """Миниатюра как в <picture> страниц; None, пока она не построена."""
+    if thumbnail is None:
+        return None
+    return {
+        'url': thumbnail.url,
+        'width': thumbnail.width,
+        'height': thumbnail.height,
+        'srcset': {
+            'webp': thumbnail.webp_srcset,
+            'jpeg': thumbnail.jpeg_srcset,
+        },
+    }
+
+
+def post_data(row, thumbnails):
+    return {
+        'id': row['pk'],
+        'text': row['text'],
+        'pub_date': row['pub_date'],
+        'author': {
+            'username': row['author__username'],
+            'full_name': full_name(
+                row['author__first_name'], row['author__last_name']
+            ),
+        },
+        'group': {
+            'slug': row['group__slug'],
+            'title': row['group__title'],
+        } if row['group__slug'] else None,
+        'comments_count': row['comments_count'],
+        'image': thumbnail_data(thumbnails.get(row['image'])),
+    }
+
+
+def feed_data(request, posts):
+    page = get_page(
+        request, posts.values(*POST_FIELDS), settings.PAGINATOR_COUNT
+    )
+    thumbnails = page_thumbnails(row['image'] for row in page)
+    return page_data(
+        request, page, [post_data(row, thumbnails) for row in page]
+    )
+
+
+def json_response(request, data):
+    """
+    JSON с ETag по содержимому: на совпавший If-None-Match — 304.
+    Анонимам страницу с тем же ETag хранит и отдаёт anonymous_page_cache.
+    """
+    response = JsonResponse(data, json_dumps_params=JSON_PARAMS)
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    response['ETag'] = etag
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+@anonymous_page_cache
+@query_budget(2)
+def index(request):
+    tag_page(request, feed_key(INDEX_FEED))
+    return json_response(request, feed_data(request, Post.objects.all()))
+
+
+@anonymous_page_cache
+@query_budget(3)
+def group_posts(request, slug):
+    group = get_object_or_404(
+        Group.objects.values(
+            'pk', 'slug', 'title', 'description', 'posts_count'
+        ),
+        slug=slug
+    )
+    tag_page(
+        request, feed_key(group_feed(group['pk'])), group_key(group['pk'])
+    )
+    return json_response(request, {
+        'group': {
+            'slug': group['slug'],
+            'title': group['title'],
+            'description': group['description'],
+            'posts_count': group['posts_count'],
+        },
+        **feed_data(request, Post.objects.filter(group_id=group['pk'])),
+    })
+
+
+@anonymous_page_cache
+@query_budget(3)
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.values(
+            'pk', 'username', 'first_name', 'last_name',
+            'stats__posts_count', 'stats__followers_count'
+        ),
+        username=username
+    )
+    tag_page(
+        request, feed_key(profile_feed(author['pk'])),
+        author_key(author['pk'])
+    )
+    return json_response(request, {
+        'author': {
+            'username': author['username'],
+            'full_name': full_name(
+                author['first_name'], author['last_name']
+            ),
+            # Без AuthorStats автор ещё ничего не публиковал
+            'posts_count': author['stats__posts_count'] or 0,
+            'followers_count': author['stats__followers_count'] or 0,
+        },
+        **feed_data(request, Post.objects.filter(author_id=author['pk'])),
+    })
+
+
+@anonymous_page_cache
+@query_budget(3)
+def post_detail(request, post_id):
+    """Пост и страница комментариев: старые сверху, ?after= — дальше."""
+    post = get_object_or_404(
+        Post.objects.values(*POST_FIELDS, 'author_id', 'group_id'),
+        pk=post_id
+    )
+    tag_page(request, post_key(post_id), author_key(post['author_id']))
+    if post['group_id']:
+        tag_page(request, group_key(post['group_id']))
+    page = get_page(
+        request,
+        Comment.objects.filter(post_id=post_id).values(*COMMENT_FIELDS),
+        settings.COMMENTS_PAGINATOR_COUNT, field='created', descending=False
+    )
+    comments = [
+        {
+            'id': row['pk'],
+            'text': row['text'],
+            'created': row['created'],
+            'author': row['author__username'],
+        }
+        for row in page
+    ]
+    return json_response(request, {
+        **post_data(post, page_thumbnails([post['image']])),
+        'comments': page_data(request, page, comments),
+    })
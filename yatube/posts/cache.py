@@ -0,0 +1,109 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.pagecache import purge
+from .paginator import AFTER, BEFORE, LazyPage
+
+VERSION_KEY = 'feed_version:{}'
+PAGES_KEY = 'feed_pages:{}:{}'
+INDEX_FEED = 'index'
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def profile_feed(author_id):
+    return f'profile:{author_id}'
+
+
+# Суррогатные ключи страниц в кэше целых страниц (core.pagecache)
+def feed_key(feed):
+    return f'feed:{feed}'
+
+
+def post_key(post_id):
+    return f'post:{post_id}'
+
+
+def author_key(author_id):
+    return f'author:{author_id}'
+
+
+def group_key(group_id):
+    return f'group:{group_id}'
+
+
+def post_feeds(post, group_ids=()):
+    """Ленты, в которых виден пост (включая прежние группы при правке)."""
+    group_ids = set(group_ids) | {post.group_id}
+    return [INDEX_FEED, profile_feed(post.author_id)] + [
+        group_feed(group_id) for group_id in group_ids if group_id
+    ]
+
+
+def _new_version():
+    # Версия от времени, а не с единицы: если ключ вытеснят из кэша,
+    # новая версия не совпадёт со старыми фрагментами
+    return int(time.time() * 1000)
+
+
+def feed_version(feed):
+    key = VERSION_KEY.format(feed)
+    version = cache.get(key)
+    if version is None:
+        version = _new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_feeds(*feeds):
+    """Сбрасывает фрагменты лент и страницы с ними целиком."""
+    purge(*(feed_key(feed) for feed in feeds))
+    for feed in set(feeds):
+        key = VERSION_KEY.format(feed)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def page_cache_key(feed, version, page_obj):
+    """
+    Страница ленты в ключе фрагмента, приведённая к одному виду: номер
+    в пределах ленты или курсор. Мусор и номера за последней страницей
+    в запросе не плодят копий фрагмента.
+    """
+    if isinstance(page_obj, LazyPage):
+        pages_key = PAGES_KEY.format(feed, version)
+        pages = cache.get(pages_key)
+        if pages is None:
+            # Первый показ этой версии ленты: фрагмента всё равно нет
+            pages = page_obj.paginator.num_pages
+            cache.set(pages_key, pages, settings.FEED_CACHE_TIMEOUT)
+        number = page_obj.requested
+        return min(number, pages) if number else pages
+    for name, key in (
+        (BEFORE, page_obj.before_key), (AFTER, page_obj.after_key)
+    ):
+        if key:
+            return f'{name}:{key[0].isoformat()}:{key[1]}'
+    return ''
+
+
+def feed_cache(feed, page_obj):
+    """
+    Контекст для `{% cache %}` ленты: ключ зависит от версии ленты
+    и от страницы, так что кэш живёт до изменения данных. Пока
+    фрагмент в кэше, страница не строится и посты не считаются.
+    """
+    version = feed_version(feed)
+    return {
+        'feed_cache_key': (
+            f'{feed}:{version}:{page_cache_key(feed, version, page_obj)}'
+        ),
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
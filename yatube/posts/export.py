@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+import zipfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .models import Comment
+
+# Строки копятся до такого размера, прежде чем уйти клиенту одним куском
+BUFFER_SIZE = 64 * 1024
+FIELDS = (
+    'type', 'id', 'post', 'author', 'group', 'pub_date', 'created', 'text',
+    'image',
+)
+
+
+def records(posts):
+    """
+    Посты, затем комментарии к ним: словари в формате import_posts.
+    iterator() читает базу кусками EXPORT_CHUNK_SIZE строк и не
+    складывает объекты в кэш выборки.
+    """
+    chunk_size = settings.EXPORT_CHUNK_SIZE
+    for pk, author, group, pub_date, text, image in posts.order_by(
+        'pk'
+    ).values_list(
+        'pk', 'author__username', 'group__slug', 'pub_date', 'text', 'image'
+    ).iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'post', 'id': pk, 'author': author, 'group': group,
+            'pub_date': pub_date.isoformat(), 'text': text, 'image': image,
+        }
+    for pk, post_id, author, created, text in Comment.objects.filter(
+        post__in=posts.values('pk')
+    ).order_by('pk').values_list(
+        'pk', 'post_id', 'author__username', 'created', 'text'
+    ).iterator(chunk_size=chunk_size):
+        yield {
+            'type': 'comment', 'id': pk, 'post': post_id, 'author': author,
+            'created': created.isoformat(), 'text': text,
+        }
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает строку, а не пишет её."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.DictWriter(Echo(), fieldnames=FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+ENCODERS = {
+    'jsonl': (jsonl_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
+
+
+def chunked(lines):
+    """Байты кусками около BUFFER_SIZE вместо отдельной строки на запись."""
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class ZipStream(io.RawIOBase):
+    """
+    Поток без seek для ZipFile: архив пишется с дескрипторами данных,
+    а записанные байты забираются drain() и сразу уходят клиенту.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def image_names(posts):
+    return posts.exclude(image='').order_by().values_list(
+        'image', flat=True
+    ).distinct().iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def zip_chunks(data_name, data, images):
+    """
+    Zip из файла выгрузки и картинок, собираемый по ходу отдачи:
+    в памяти только текущий кусок, а не архив целиком.
+    """
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(data_name, 'w', force_zip64=True) as member:
+            for chunk in data:
+                member.write(chunk)
+                yield stream.drain()
+        for name in images:
+            try:
+                source = default_storage.open(name)
+            except OSError:
+                # Файл картинки потерян: выгрузка важнее
+                continue
+            # JPEG и PNG уже сжаты: кладём как есть
+            info = zipfile.ZipInfo(f'images/{name}')
+            info.compress_type = zipfile.ZIP_STORED
+            with source, archive.open(info, 'w', force_zip64=True) as member:
+                for block in source.chunks():
+                    member.write(block)
+                    yield stream.drain()
+    yield stream.drain()
+
+
+def export(posts, file_format, filename, with_images=False):
+    """
+    (итератор байтов, content type, имя файла) выгрузки постов `posts`
+    и комментариев к ним в JSON Lines или CSV, по желанию — zip
+    с картинками.
+    """
+    encode, content_type = ENCODERS[file_format]
+    data = chunked(encode(records(posts)))
+    data_name = f'{filename}.{file_format}'
+    if not with_images:
+        return data, content_type, data_name
+    chunks = zip_chunks(data_name, data, image_names(posts))
+    return (
+        (chunk for chunk in chunks if chunk), 'application/zip',
+        f'{filename}.zip'
+    )
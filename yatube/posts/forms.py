@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Post, Comment
+from .thumbnails import cap_original
 
 
 class PostForm(forms.ModelForm):
@@ -17,6 +19,13 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост',
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # При правке без новой загрузки здесь уже сохранённый файл
+        if isinstance(image, UploadedFile):
+            return cap_original(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
 
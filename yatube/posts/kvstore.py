@@ -0,0 +1,35 @@
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class KVStore(CachedDBStore):
+    """
+    KV-хранилище sorl с пакетным чтением: все ключи страницы берутся
+    из кэша одним get_many, промахи добираются одним запросом к БД.
+    Отсутствие миниатюры тоже кэшируется, как и в get().
+    """
+
+    def get_many(self, image_files):
+        """{ключ файла: ImageFile или None}."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self.cache.get_many(list(keys))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=missing
+            ).values_list('key', 'value'))
+            fresh = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(fresh, settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(fresh)
+        return {
+            keys[key]: (
+                None if value == EMPTY_VALUE
+                else deserialize_image_file(value)
+            )
+            for key, value in values.items()
+        }
@@ -0,0 +1,56 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import build
+
+CHUNK_SIZE = 50
+
+
+def build_chunk(names):
+    """Выполняется в дочернем процессе: (построено, с ошибкой)."""
+    built = sum(1 for name in names if build(name) is not None)
+    return built, len(names) - built
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит миниатюры для всех картинок постов в пуле процессов. '
+        'Уже готовые миниатюры берутся из KV-хранилища и не пересоздаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        # Имена картинок, а не посты: одна картинка может быть у многих
+        names = list(
+            Post.objects.exclude(image='').order_by().values_list(
+                'image', flat=True
+            ).distinct()
+        )
+        size = options['chunk_size']
+        chunks = [names[i:i + size] for i in range(0, len(names), size)]
+        # Дочерние процессы не должны делить соединения с родителем
+        connections.close_all()
+        built = failed = 0
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], initializer=django.setup
+        ) as pool:
+            for chunk_built, chunk_failed in pool.map(build_chunk, chunks):
+                built += chunk_built
+                failed += chunk_failed
+        self.stdout.write(
+            f'Картинок: {len(names)}, готово: {built}, ошибок: {failed} '
+            f'за {time.perf_counter() - started:.1f} с'
+        )
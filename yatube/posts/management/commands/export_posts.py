@@ -0,0 +1,63 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import ENCODERS, export
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты автора или группы и комментарии к ним в JSON '
+        'Lines или CSV (формат import_posts), по желанию — zip '
+        'с картинками. Память не зависит от числа постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл выгрузки или - для stdout.')
+        # Не required=True: такую группу call_command в Django 2.2 не передаёт
+        owner = parser.add_mutually_exclusive_group()
+        owner.add_argument('--author', help='Имя пользователя.')
+        owner.add_argument('--group', help='Slug группы.')
+        parser.add_argument(
+            '--format', choices=sorted(ENCODERS), default='jsonl'
+        )
+        parser.add_argument(
+            '--images', action='store_true',
+            help='Zip-архив с выгрузкой и файлами картинок.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['author'] and not options['group']:
+            raise CommandError('Укажите --author или --group.')
+        try:
+            if options['author']:
+                owner = User.objects.get(username=options['author'])
+                posts, filename = owner.posts.all(), f'posts-{owner}'
+            else:
+                owner = Group.objects.get(slug=options['group'])
+                posts, filename = owner.posts.all(), f'group-{owner.slug}'
+        except (User.DoesNotExist, Group.DoesNotExist) as error:
+            raise CommandError(error)
+        chunks, _, name = export(
+            posts, options['format'], filename, options['images']
+        )
+        started = time.perf_counter()
+        written = 0
+        output = options['output']
+        stream = (
+            sys.stdout.buffer if output == '-' else open(output, 'wb')
+        )
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+                written += len(chunk)
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
+        if output != '-':
+            self.stdout.write(
+                f'{name}: {written} байт за '
+                f'{time.perf_counter() - started:.1f} с'
+            )
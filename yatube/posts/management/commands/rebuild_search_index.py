@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from posts.models import Post
+from posts.search import FTS_TABLE, enabled
+
+from .recount_posts import batches
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс FTS5 по всем постам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько постов индексировать за одну транзакцию.'
+        )
+
+    def handle(self, *args, **options):
+        if not enabled():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite.')
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            indexed = 0
+            for pks in batches(Post.objects.all(), options['batch_size']):
+                with transaction.atomic():
+                    cursor.execute(
+                        f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                        'SELECT id, text FROM posts_post '
+                        'WHERE id BETWEEN %s AND %s',
+                        [pks[0], pks[-1]]
+                    )
+                indexed += len(pks)
+            # Сливает сегменты индекса после массовой вставки
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+            )
+        self.stdout.write(f'Проиндексировано постов: {indexed}')
@@ -0,0 +1,123 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+
+from posts.models import AuthorStats, Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 1000
+
+
+def batches(queryset, batch_size):
+    """Первичные ключи пачками, без OFFSET: по возрастанию id."""
+    last_pk = 0
+    while True:
+        pks = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size]
+        )
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def counts(queryset, key, pks):
+    return dict(
+        queryset.filter(**{f'{key}__in': pks}).values_list(key).annotate(
+            total=Count('pk')
+        ).order_by()
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов и подписчиков авторов, постов групп '
+        'и комментариев постов, исправляя расхождения, '
+        'и обновляет статистику таблицы постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько строк пересчитывать за одну транзакцию.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        self.stdout.write('Авторы: {}'.format(
+            self.recount_authors(batch_size)))
+        self.stdout.write('Группы: {}'.format(
+            self.recount_groups(batch_size)))
+        self.stdout.write('Посты: {}'.format(
+            self.recount_posts(batch_size)))
+        # Свежая статистика для планировщика запросов
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Post._meta.db_table}')
+
+    def recount_authors(self, batch_size):
+        fields = ('posts_count', 'followers_count')
+        fixed = 0
+        for pks in batches(User.objects.all(), batch_size):
+            with transaction.atomic():
+                totals = {
+                    'posts_count': counts(Post.objects.all(), 'author', pks),
+                    'followers_count': counts(
+                        Follow.objects.all(), 'author', pks
+                    ),
+                }
+                current = {
+                    author_id: values for author_id, *values in
+                    AuthorStats.objects.select_for_update().filter(
+                        author_id__in=pks
+                    ).values_list('author_id', *fields)
+                }
+                expected = {
+                    pk: [totals[field].get(pk, 0) for field in fields]
+                    for pk in pks
+                }
+                missing = [
+                    AuthorStats(author_id=pk, **dict(zip(fields, values)))
+                    for pk, values in expected.items() if pk not in current
+                ]
+                changed = [
+                    AuthorStats(author_id=pk, **dict(zip(fields, values)))
+                    for pk, values in expected.items()
+                    if pk in current and current[pk] != values
+                ]
+                AuthorStats.objects.bulk_create(
+                    missing, ignore_conflicts=True
+                )
+                AuthorStats.objects.bulk_update(changed, fields)
+                fixed += len(missing) + len(changed)
+        return fixed
+
+    def recount_groups(self, batch_size):
+        return self.recount(
+            Group.objects.all(), 'posts_count',
+            Post.objects.all(), 'group', batch_size
+        )
+
+    def recount_posts(self, batch_size):
+        return self.recount(
+            Post.objects.all(), 'comments_count',
+            Comment.objects.all(), 'post', batch_size
+        )
+
+    def recount(self, queryset, field, children, key, batch_size):
+        fixed = 0
+        for pks in batches(queryset, batch_size):
+            with transaction.atomic():
+                totals = counts(children, key, pks)
+                changed = []
+                for pk, current in queryset.select_for_update().filter(
+                    pk__in=pks
+                ).values_list('pk', field):
+                    total = totals.get(pk, 0)
+                    if current != total:
+                        changed.append(queryset.model(
+                            pk=pk, **{field: total}
+                        ))
+                queryset.model.objects.bulk_update(changed, [field])
+                fixed += len(changed)
+        return fixed
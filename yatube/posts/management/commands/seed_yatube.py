@@ -0,0 +1,239 @@
+import io
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from faker import Faker
+from PIL import Image
+
+from core.pagecache import purge
+from posts import search
+from posts.cache import (
+    INDEX_FEED, author_key, bump_feeds, group_feed, group_key, profile_feed
+)
+from posts.models import Comment, Group, Post, User
+from posts.timeline import fan_out_range
+
+BATCH_SIZE = 5000
+START = datetime(2020, 1, 1, tzinfo=timezone.utc)
+PLACEHOLDER = 'posts/seed/placeholder_{}.jpg'
+PLACEHOLDER_SIZE = (1200, 600)
+
+
+def next_pk(model):
+    """
+    Первый ключ для явной вставки. В SQLite — и после когда-либо
+    выданных (sqlite_sequence у AUTOINCREMENT): ключ удалённой строки
+    не достанется новой и не совпадёт с её rowid в поиске и суррогатными
+    ключами страниц в кэше.
+    """
+    top = model.objects.aggregate(top=Max('pk'))['top'] or 0
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT seq FROM sqlite_sequence WHERE name = %s',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row is not None:
+            top = max(top, row[0])
+    return top + 1
+
+
+def bulk_create_dated(model, objs, field):
+    """
+    bulk_create с датами из объектов. auto_now_add затирает их при
+    вставке, а выключать его на общем поле нельзя — это видно всем
+    потокам процесса. Поэтому даты пачки дописываются bulk_update.
+    """
+    dates = [getattr(obj, field) for obj in objs]
+    model.objects.bulk_create(objs)
+    for obj, value in zip(objs, dates):
+        setattr(obj, field, value)
+    model.objects.bulk_update(objs, [field])
+
+
+def index_range(first, last):
+    """Поиск и ленты подписок для постов first..last — запросом на все."""
+    if search.enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {search.FTS_TABLE} (rowid, text) '
+                'SELECT id, text FROM posts_post '
+                'WHERE id BETWEEN %s AND %s', [first, last]
+            )
+    fan_out_range(first, last)
+
+
+def refresh_caches(author_ids, group_ids):
+    """
+    bulk_create не шлёт сигналов: индекс поиска, ленты и страницы
+    затронутых авторов и групп обновляются один раз после вставки.
+    """
+    if search.enabled():
+        with connection.cursor() as cursor:
+            # Сливает сегменты индекса после массовой вставки
+            cursor.execute(
+                f'INSERT INTO {search.FTS_TABLE} ({search.FTS_TABLE}) '
+                "VALUES ('optimize')"
+            )
+    bump_feeds(
+        INDEX_FEED,
+        *(group_feed(group_id) for group_id in group_ids),
+        *(profile_feed(author_id) for author_id in author_ids)
+    )
+    purge(
+        *(author_key(author_id) for author_id in author_ids),
+        *(group_key(group_id) for group_id in group_ids)
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и картинками для бенчмарков. При одном --seed '
+        'данные совпадают между запусками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.1,
+            help='Доля постов с картинкой.'
+        )
+        parser.add_argument(
+            '--placeholders', type=int, default=8,
+            help='Сколько разных картинок-заглушек создать.'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        seed = options['seed']
+        if options['posts'] and not options['users']:
+            raise CommandError('Постам нужны авторы: задайте --users.')
+
+        # Заглушки пишутся в MEDIA_ROOT, только если их возьмут посты
+        images = (
+            self.make_placeholders(options['placeholders'])
+            if options['posts'] and options['image_ratio'] > 0 else []
+        )
+        users = self.create(User, options['users'], lambda pk, i: User(
+            pk=pk,
+            username=f'{self.fake.user_name()}_{seed}_{i}',
+            first_name=self.fake.first_name(),
+            last_name=self.fake.last_name(),
+            password=UNUSABLE_PASSWORD_PREFIX,
+        ))
+        groups = self.create(Group, options['groups'], lambda pk, i: Group(
+            pk=pk,
+            title=self.fake.sentence(nb_words=3)[:200],
+            slug=f'group-{seed}-{i}',
+            description=self.fake.paragraph(),
+        ))
+        posts = self.create(Post, options['posts'], lambda pk, i: Post(
+            pk=pk,
+            text=self.fake.paragraph(nb_sentences=4),
+            pub_date=START + timedelta(minutes=i),
+            author_id=self.rnd.choice(users),
+            group_id=(
+                self.rnd.choice(groups)
+                if groups and self.rnd.random() < 0.7 else None
+            ),
+            image=(
+                self.rnd.choice(images)
+                if images
+                and self.rnd.random() < options['image_ratio'] else ''
+            ),
+        ), dated='pub_date')
+        if posts:
+            self.create(Comment, options['comments'], self.comment_builder(
+                users, posts
+            ), dated='created')
+
+        self.reset_sequences(User, Group, Post, Comment)
+        # bulk_create не шлёт сигналов: производные данные одним проходом
+        call_command('recount_posts', stdout=io.StringIO())
+        if posts:
+            with transaction.atomic():
+                index_range(posts[0], posts[-1])
+            refresh_caches(users, groups)
+
+    def comment_builder(self, users, posts):
+        def build(pk, i):
+            post_index = self.rnd.randrange(len(posts))
+            return Comment(
+                pk=pk,
+                text=self.fake.sentence(),
+                # Комментарий позже своего поста, но в пределах суток
+                created=START + timedelta(
+                    minutes=post_index, seconds=self.rnd.randint(1, 86400)
+                ),
+                author_id=self.rnd.choice(users),
+                post_id=posts[post_index],
+            )
+        return build
+
+    def create(self, model, count, build, dated=None):
+        """
+        Вставляет `count` строк пачками по batch_size: в памяти только
+        текущая пачка. Даты поля `dated` берутся из объектов.
+        Возвращает range выданных первичных ключей.
+        """
+        started = time.perf_counter()
+        first = next_pk(model)
+        rows = (build(first + i, i) for i in range(count))
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                if dated:
+                    bulk_create_dated(model, batch, dated)
+                else:
+                    model.objects.bulk_create(batch)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{model.__name__}: {count} за {elapsed:.1f} с'
+        )
+        return range(first, first + count)
+
+    def make_placeholders(self, count):
+        names = []
+        for number in range(count):
+            name = PLACEHOLDER.format(number)
+            if not default_storage.exists(name):
+                # Свой генератор: наличие файлов не сдвигает основной
+                palette = random.Random(number)
+                color = tuple(palette.randrange(256) for _ in range(3))
+                buffer = io.BytesIO()
+                Image.new('RGB', PLACEHOLDER_SIZE, color).save(
+                    buffer, 'JPEG'
+                )
+                name = default_storage.save(
+                    name, ContentFile(buffer.getvalue())
+                )
+            names.append(name)
+        return names
+
+    def reset_sequences(self, *models):
+        # Ключи выданы явно: базам с последовательностями их нужно сдвинуть
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import User
+from posts.timeline import trim
+from .recount_posts import BATCH_SIZE, batches
+
+
+class Command(BaseCommand):
+    help = (
+        'Обрезает ленты подписок до TIMELINE_LENGTH последних записей '
+        'на читателя. Запускать по расписанию: при публикации ленты '
+        'только растут.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько читателей обрезать за одну транзакцию.'
+        )
+        parser.add_argument(
+            '--length', type=int, default=settings.TIMELINE_LENGTH,
+            help='Сколько записей оставить в каждой ленте.'
+        )
+
+    def handle(self, *args, **options):
+        removed = 0
+        for pks in batches(User.objects.all(), options['batch_size']):
+            with transaction.atomic():
+                removed += trim(pks, options['length'])
+        self.stdout.write(f'Удалено записей: {removed}')
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+CREATE_SQL = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "text, tokenize='unicode61 remove_diacritics 2')",
+    'INSERT INTO posts_post_fts (rowid, text) '
+    'SELECT id, text FROM posts_post',
+]
+DROP_SQL = 'DROP TABLE posts_post_fts'
+
+
+# FTS5 — расширение SQLite: на других базах индекса нет
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREATE_SQL:
+            schema_editor.execute(sql)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_comment_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
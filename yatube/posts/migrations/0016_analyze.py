@@ -0,0 +1,13 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_follow_timeline'),
+    ]
+
+    operations = [
+        # Статистика для планировщика запросов
+        migrations.RunSQL(sql='ANALYZE', reverse_sql=migrations.RunSQL.noop),
+    ]
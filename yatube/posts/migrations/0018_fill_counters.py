@@ -0,0 +1,51 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 1000
+
+
+def counted(model, key):
+    """Число строк `model` на владельца OuterRef('pk'); 0, если их нет."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{key: OuterRef('pk')}).order_by().values(
+            key
+        ).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Счётчики из 0012 и 0015 появились с нулями: ленты групп и профилей
+    считают страницы по ним, и без заполнения видна одна страница.
+    Тот же пересчёт, что в recount_posts, одним UPDATE на таблицу.
+    """
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    authors = set(Post.objects.values_list('author_id', flat=True))
+    authors |= set(Follow.objects.values_list('author_id', flat=True))
+    authors -= set(AuthorStats.objects.values_list('author_id', flat=True))
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(author_id=pk) for pk in authors], batch_size=BATCH_SIZE
+    )
+    AuthorStats.objects.update(
+        posts_count=counted(Post, 'author'),
+        followers_count=counted(Follow, 'author'),
+    )
+    Group.objects.update(posts_count=counted(Post, 'group'))
+    Post.objects.update(comments_count=counted(Comment, 'post'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_imported_post'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
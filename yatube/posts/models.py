@@ -4,7 +4,27 @@ from django.db import models
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountersMixin:
+    """
+    Счётчики меняются только через F()-выражения в сигналах:
+    обычное сохранение модели не перезаписывает их устаревшим значением.
+    """
+    counters = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.counters
+            ]
+        super().save(*args, **kwargs)
+
+
+class Group(CountersMixin, models.Model):
     title = models.CharField(
         verbose_name='Название группы',
         max_length=200
@@ -14,6 +34,12 @@ class Group(models.Model):
         unique=True
     )
     description = models.TextField(verbose_name='Описание')
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Количество постов',
+        default=0,
+        editable=False
+    )
+    counters = ('posts_count',)
 
     class Meta:
         verbose_name = 'Группа'
@@ -23,7 +49,7 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class Post(CountersMixin, models.Model):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста',
@@ -52,17 +78,60 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='Количество комментариев',
+        default=0,
+        editable=False
+    )
+    counters = ('comments_count',)
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Под ленты: главная, автор и группа, новые сверху;
+        # id в конце покрывает и курсорный порядок (-pub_date, -id)
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'), name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_date_idx'
+            ),
+        )
 
     def __str__(self):
         # выводим текст поста
         return self.text[:15]
 
 
+class AuthorStats(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='Количество постов',
+        default=0
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+        verbose_name_plural = 'Счётчики авторов'
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post,
@@ -81,3 +150,113 @@ class Comment(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации комментария'
     )
+
+    class Meta:
+        ordering = ('created',)
+        indexes = (
+            models.Index(
+                fields=('post', 'created'), name='comment_post_created_idx'
+            ),
+        )
+
+
+class Follow(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follower',
+        verbose_name='Подписчик',
+        # Покрыт уникальным индексом (user, author)
+        db_index=False,
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        verbose_name='Автор',
+        db_index=False,
+    )
+
+    class Meta:
+        verbose_name = 'Подписка'
+        verbose_name_plural = 'Подписки'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'), name='follow_unique'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='follow_not_self'
+            ),
+        )
+        # Подписчики автора: для раздачи поста по лентам
+        indexes = (
+            models.Index(
+                fields=('author', 'user'), name='follow_author_user_idx'
+            ),
+        )
+
+
+class TimelineEntry(models.Model):
+    """
+    Пост в ленте подписок читателя, разложенный при публикации
+    (fan-out on write). pub_date и author скопированы из поста для
+    ключа страницы и для чистки при отписке.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи лент подписок'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'post'), name='timeline_unique'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-post'),
+                name='timeline_user_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'), name='timeline_user_author_idx'
+            ),
+        )
+
+
+class ImportedPost(models.Model):
+    """
+    Ключ записи из внешнего источника (manage.py import_posts): по нему
+    повторный импорт пропускает уже загруженные посты.
+    """
+    key = models.CharField(
+        max_length=255,
+        unique=True,
+        verbose_name='Ключ в источнике'
+    )
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пост'
+    )
+
+    class Meta:
+        verbose_name = 'Импортированный пост'
+        verbose_name_plural = 'Импортированные посты'
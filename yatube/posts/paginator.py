@@ -1,8 +1,364 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+from collections.abc import Sequence
 
-from yatube.settings import PAGINATOR_COUNT
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import Page, Paginator
+from django.db.models import Max, Q, Sum
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import SimpleLazyObject, cached_property
+from django.utils.module_loading import import_string
 
+from .models import AuthorStats, Group
 
-def paginator_page(request, queryset):
-    return Paginator(
-        queryset, PAGINATOR_COUNT).get_page(request.GET.get('page'))
+AFTER = 'after'
+BEFORE = 'before'
+COUNT_KEY = 'feed_count:{}:{}'
+
+
+def encode_token(*parts):
+    """Непрозрачный urlsafe-токен из частей ключа."""
+    raw = '|'.join(str(part) for part in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_token(token, count):
+    """Части ключа из `encode_token` или None, если токен испорчен."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(
+            token + '=' * (-len(token) % 4)
+        ).decode()
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    parts = raw.rsplit('|', count - 1)
+    return parts if len(parts) == count else None
+
+
+def encode_cursor(obj, field='pub_date'):
+    """Непрозрачный токен позиции в выборке: (дата, id)."""
+    return encode_token(getattr(obj, field).isoformat(), obj.pk)
+
+
+def decode_cursor(token):
+    """Возвращает (дата, id) или None, если токен испорчен."""
+    parts = decode_token(token, 2)
+    if parts is None:
+        return None
+    try:
+        pub_date = parse_datetime(parts[0])
+        pk = int(parts[1])
+    except ValueError:
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPage(Sequence):
+    """
+    Страница ленты, совместимая с шаблонами, которые ждут `page_obj`.
+    Как и у Django `Page`, запрос выполняется только при первом обращении.
+    """
+
+    def __init__(self, paginator, after_key=None, before_key=None):
+        self.paginator = paginator
+        self.after_key = after_key
+        self.before_key = before_key
+
+    def __repr__(self):
+        return f'<Cursor page of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    @cached_property
+    def _window(self):
+        per_page = self.paginator.per_page
+        queryset = self.paginator.queryset
+        field = self.paginator.field
+        # Вперёд — к старым записям в ленте (по убыванию даты)
+        # или к новым в комментариях (по возрастанию)
+        forward, backward = ('lt', 'gt') if self.paginator.descending else (
+            'gt', 'lt'
+        )
+        if self.before_key:
+            value, pk = self.before_key
+            rows = list(queryset.filter(
+                Q(**{f'{field}__{backward}': value})
+                | Q(**{field: value, f'pk__{backward}': pk})
+            ).order_by(*self.paginator.ordering(reverse=True))[:per_page + 1])
+            return rows[:per_page][::-1], True, len(rows) > per_page
+        queryset = queryset.order_by(*self.paginator.ordering())
+        if self.after_key:
+            value, pk = self.after_key
+            queryset = queryset.filter(
+                Q(**{f'{field}__{forward}': value})
+                | Q(**{field: value, f'pk__{forward}': pk})
+            )
+        rows = list(queryset[:per_page + 1])
+        return rows[:per_page], len(rows) > per_page, bool(self.after_key)
+
+    @property
+    def object_list(self):
+        return self._window[0]
+
+    def has_next(self):
+        return self._window[1]
+
+    def has_previous(self):
+        return self._window[2]
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def cursor(self, obj):
+        return encode_cursor(obj, self.paginator.field)
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return self.cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return self.cursor(self.object_list[0])
+        return None
+
+
+class CursorPaginator:
+    """
+    Пагинация по ключу (дата, id) без COUNT и OFFSET:
+    стоимость запроса не зависит от глубины страницы.
+    По умолчанию — лента постов, новые сверху.
+    """
+    is_cursor = True
+    page_class = CursorPage
+
+    def __init__(self, queryset, per_page, field='pub_date', descending=True):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.field = field
+        self.descending = descending
+
+    def ordering(self, reverse=False):
+        if self.descending != reverse:
+            return (f'-{self.field}', '-pk')
+        return (self.field, 'pk')
+
+    def get_page(self, after=None, before=None):
+        before_key = decode_cursor(before)
+        if before_key:
+            return self.page_class(self, before_key=before_key)
+        return self.page_class(self, after_key=decode_cursor(after))
+
+
+class LazyPage(SimpleLazyObject):
+    """
+    Страница, которую пагинатор строит при первом обращении. Ленту из
+    кэша фрагментов шаблон не читает: номер не проверяется, и посты не
+    считаются. `requested` — номер из запроса так, как его поймёт
+    get_page(): не число — 1, меньше единицы — None (последняя).
+    """
+
+    def __init__(self, func, requested):
+        super().__init__(func)
+        # Мимо __setattr__ обёртки: иначе он построил бы страницу
+        self.__dict__['requested'] = requested
+
+
+def requested_number(value):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return 1
+    return number if number >= 1 else None
+
+
+class ElidedPage(Page):
+    @property
+    def elided_page_range(self):
+        return self.paginator.get_elided_page_range(self.number)
+
+
+class ElidedPaginator(Paginator):
+    """
+    Номера страниц окном: первые и последние on_ends страниц и по
+    on_each_side вокруг текущей, пропуски — ELLIPSIS. Навигация не
+    растёт с числом постов, в отличие от цикла по page_range.
+    """
+    ELLIPSIS = '…'
+    on_each_side = 3
+    on_ends = 2
+
+    def get_elided_page_range(self, number=1):
+        number = self.validate_number(number)
+        last = self.num_pages
+        window = range(
+            max(number - self.on_each_side, 1),
+            min(number + self.on_each_side, last) + 1
+        )
+        head = range(1, min(self.on_ends, last) + 1)
+        tail = range(max(last - self.on_ends + 1, 1), last + 1)
+        previous = 0
+        for page in sorted(set(head) | set(window) | set(tail)):
+            if page > previous + 1:
+                yield self.ELLIPSIS
+            yield page
+            previous = page
+
+    def _get_page(self, *args, **kwargs):
+        return ElidedPage(*args, **kwargs)
+
+
+class CountedPaginator(ElidedPaginator):
+    """ElidedPaginator, у которого число объектов даёт `counter()`."""
+
+    def __init__(self, object_list, per_page, counter, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.counter = counter
+
+    @cached_property
+    def count(self):
+        return self.counter()
+
+
+def table_estimate(queryset):
+    """
+    Число строк таблицы без COUNT: MAX(id) — один шаг по первичному
+    ключу. id у строк разные, так что оценка не бывает меньше числа
+    строк и растёт вместе с таблицей: навигация доходит до самых старых
+    постов. После удалений оценка завышена, и в конце бывают пустые
+    страницы.
+    """
+    return queryset.model._base_manager.aggregate(
+        last=Max('pk')
+    )['last'] or 0
+
+
+def exact_count(queryset, feed, owner):
+    return queryset.count()
+
+
+def owner_counter(owner):
+    """
+    Денормализованный счётчик: posts_count группы или автора, которые
+    вьюха уже загрузила, а у главной ленты — сумма по авторам.
+    """
+    if owner is None:
+        return AuthorStats.objects.aggregate(
+            total=Sum('posts_count')
+        )['total'] or 0
+    if isinstance(owner, Group):
+        return owner.posts_count
+    try:
+        return owner.stats.posts_count
+    except ObjectDoesNotExist:
+        # Автор ещё ничего не публиковал
+        return 0
+
+
+def counter_count(queryset, feed, owner):
+    """
+    Счётчик владельца ленты, но не меньше точного числа постов до
+    PAGINATOR_ESTIMATE_EXACT_LIMIT: отставший счётчик (не пересчитан,
+    прижат к нулю при расхождении) отрезал бы старые страницы.
+    """
+    limit = settings.PAGINATOR_ESTIMATE_EXACT_LIMIT
+    return max(
+        owner_counter(owner), queryset.order_by()[:limit + 1].count()
+    )
+
+
+def cached_count(queryset, feed, owner):
+    """
+    COUNT из кэша на PAGINATOR_COUNT_CACHE_TIMEOUT. Ключ содержит
+    версию ленты, а её меняют сигналы постов: новый пост сбрасывает счёт.
+    """
+    from .cache import feed_version
+    # Тот же id ленты, что у group_feed() и profile_feed()
+    feed_id = feed if owner is None else f'{feed}:{owner.pk}'
+    key = COUNT_KEY.format(feed_id, feed_version(feed_id))
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATOR_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def estimated_count(queryset, feed, owner):
+    """
+    Вся таблица — по статистике; отфильтрованная выборка считается
+    точно до PAGINATOR_ESTIMATE_EXACT_LIMIT строк, дальше — cached_count.
+    """
+    if not queryset.query.where:
+        return table_estimate(queryset)
+    limit = settings.PAGINATOR_ESTIMATE_EXACT_LIMIT
+    exact = queryset.order_by()[:limit + 1].count()
+    if exact <= limit:
+        return exact
+    return cached_count(queryset, feed, owner)
+
+
+COUNT_STRATEGIES = {
+    'exact': exact_count,
+    'counter': counter_count,
+    'cached': cached_count,
+    'estimate': estimated_count,
+}
+
+
+def count_strategy(feed):
+    """Стратегия из PAGINATOR_COUNT_STRATEGIES: имя или путь к функции."""
+    name = settings.PAGINATOR_COUNT_STRATEGIES.get(feed, 'exact')
+    if name in COUNT_STRATEGIES:
+        return COUNT_STRATEGIES[name]
+    return import_string(name)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator для больших таблиц: COUNT идёт не дальше
+    PAGINATOR_ESTIMATE_EXACT_LIMIT строк. Если их больше, у таблицы без
+    фильтров число берётся по статистике (table_estimate),
+    у отфильтрованной выборки — сам предел.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.PAGINATOR_ESTIMATE_EXACT_LIMIT
+        queryset = self.object_list.order_by()
+        exact = queryset[:limit + 1].count()
+        if exact <= limit:
+            return exact
+        if queryset.query.where:
+            return limit
+        return max(table_estimate(queryset), limit)
+
+
+def paginator_page(request, queryset, feed=None, owner=None):
+    """
+    Страница ленты `feed` ('index', 'group', 'profile'); `owner` —
+    группа или автор ленты, если они у вьюхи уже есть.
+    """
+    if feed in settings.PAGINATOR_CURSOR_FEEDS:
+        return CursorPaginator(queryset, settings.PAGINATOR_COUNT).get_page(
+            request.GET.get(AFTER), request.GET.get(BEFORE)
+        )
+    strategy = count_strategy(feed)
+    paginator = CountedPaginator(
+        queryset, settings.PAGINATOR_COUNT,
+        lambda: strategy(queryset, feed, owner)
+    )
+    number = request.GET.get('page')
+    return LazyPage(
+        lambda: paginator.get_page(number), requested_number(number)
+    )
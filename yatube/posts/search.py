@@ -0,0 +1,154 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils.functional import cached_property
+
+from .models import Post
+from .paginator import CursorPage, decode_token, encode_token
+
+FTS_TABLE = 'posts_post_fts'
+MAX_TERMS = 8
+WORD = re.compile(r'\w+')
+
+
+def match_expression(query):
+    """
+    Выражение MATCH из строки читателя: каждое слово как префикс,
+    слова через AND. Кавычки и операторы FTS5 из ввода не проходят.
+    """
+    words = WORD.findall(query.lower())[:MAX_TERMS]
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def enabled():
+    """FTS5 — расширение SQLite: на других базах миграция 0014 индекс
+    не создаёт, и запись в него и поиск по нему отключены."""
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, text) '
+            'VALUES (%s, %s)',
+            [post.pk, post.text]
+        )
+
+
+def unindex_post(post_id):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+        )
+
+
+def matching_ids(query):
+    """Подзапрос id постов, подходящих под запрос, для filter(pk__in=...)."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)]
+    )
+
+
+def ranked_ids(expression, limit, after=None, before=None):
+    """
+    [(id, rank)] по релевантности bm25, по ключу (rank, id).
+    rank не хранится в индексе: FTS5 считает bm25 для каждого совпадения
+    на каждой странице, и курсор не сокращает эту работу — глубину
+    выдачи ограничивает SEARCH_MAX_RESULTS.
+    """
+    sql = f'SELECT rowid, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+    params = [expression]
+    order = 'rank, rowid'
+    if after:
+        sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+        params += [after[0], after[0], after[1]]
+    elif before:
+        sql += ' AND (rank < %s OR (rank = %s AND rowid < %s))'
+        params += [before[0], before[0], before[1]]
+        order = 'rank DESC, rowid DESC'
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} ORDER BY {order} LIMIT %s', params + [limit])
+        return cursor.fetchall()
+
+
+def decode_rank_cursor(token):
+    """(rank, id, позиция в выдаче) или None, если токен испорчен."""
+    parts = decode_token(token, 3)
+    if parts is None:
+        return None
+    try:
+        return float(parts[0]), int(parts[1]), int(parts[2])
+    except ValueError:
+        return None
+
+
+class SearchPage(CursorPage):
+    """
+    Страница выдачи: посты по убыванию релевантности. Курсор помнит
+    позицию поста в выдаче, и дальше SEARCH_MAX_RESULTS страниц нет.
+    """
+
+    def cursor(self, post):
+        return encode_token(
+            repr(post.search_rank), post.pk, post.search_position
+        )
+
+    @property
+    def start(self):
+        """Позиция первого поста страницы в выдаче."""
+        if self.before_key:
+            return max(self.before_key[2] - self.paginator.per_page, 0)
+        if self.after_key:
+            return self.after_key[2] + 1
+        return 0
+
+    @cached_property
+    def _window(self):
+        expression = self.paginator.expression
+        start = self.start
+        if (not enabled() or not expression
+                or start >= settings.SEARCH_MAX_RESULTS):
+            return [], False, False
+        per_page = self.paginator.per_page
+        rows = ranked_ids(
+            expression, per_page + 1, self.after_key, self.before_key
+        )
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        if self.before_key:
+            rows.reverse()
+        posts = self.paginator.queryset.in_bulk([pk for pk, _ in rows])
+        object_list = []
+        for position, (pk, rank) in enumerate(rows, start):
+            # Индекс может отставать от удалённых в обход сигналов постов
+            if pk in posts:
+                posts[pk].search_rank = rank
+                posts[pk].search_position = position
+                object_list.append(posts[pk])
+        if self.before_key:
+            return object_list, True, more
+        more = more and start + per_page < settings.SEARCH_MAX_RESULTS
+        return object_list, more, bool(self.after_key)
+
+
+class SearchPaginator:
+    """Курсорная пагинация выдачи FTS5 по ключу (rank, id)."""
+    is_cursor = True
+
+    def __init__(self, query, per_page):
+        self.expression = match_expression(query)
+        self.queryset = Post.objects.select_related('author', 'group')
+        self.per_page = int(per_page)
+
+    def get_page(self, after=None, before=None):
+        before_key = decode_rank_cursor(before)
+        if before_key:
+            return SearchPage(self, before_key=before_key)
+        return SearchPage(self, after_key=decode_rank_cursor(after))
@@ -0,0 +1,155 @@
+from functools import partial
+from threading import local
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from . import search, thumbnails, timeline
+from core.pagecache import purge
+from .cache import (
+    INDEX_FEED, author_key, bump_feeds, group_feed, group_key, post_feeds,
+    post_key
+)
+from .models import AuthorStats, Comment, Follow, Group, Post
+
+# id постов, удаляемых в этом потоке: их комментарии уходят каскадом
+_deleting = local()
+
+
+def shift_counter(queryset, field, delta):
+    # Счётчик мог разойтись с данными (bulk_create, правка в обход ORM):
+    # не уводим его ниже нуля, это починит recount_posts
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_author_stats(author_id, field, delta):
+    stats = AuthorStats.objects.filter(author_id=author_id)
+    if shift_counter(stats, field, delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            AuthorStats.objects.create(author_id=author_id, **{field: delta})
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        shift_counter(stats, field, delta)
+
+
+def change_group_posts(group_id, delta):
+    if group_id:
+        shift_counter(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+@receiver(post_init, sender=Post)
+def remember_loaded(sender, instance, **kwargs):
+    # Значения на момент загрузки: при переносе поста правим и старую
+    # группу, при смене картинки строим миниатюру. Через __dict__, чтобы
+    # отложенные поля (only/defer) не подгружались отдельным запросом.
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+    instance._loaded_image = str(instance.__dict__.get('image') or '')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, update_fields=None, **kwargs):
+    old_group_id = instance._loaded_group_id
+    if created or update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+    if created:
+        change_author_stats(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+        change_group_posts(instance.group_id, 1)
+    elif old_group_id != instance.group_id:
+        change_group_posts(old_group_id, -1)
+        change_group_posts(instance.group_id, 1)
+    bump_feeds(*post_feeds(instance, [old_group_id]))
+    purge(post_key(instance.pk))
+    if created:
+        # Число постов автора видно на странице каждого его поста
+        purge(author_key(instance.author_id))
+    instance._loaded_group_id = instance.group_id
+    if instance.image and instance.image.name != instance._loaded_image:
+        transaction.on_commit(
+            partial(thumbnails.schedule, instance.image.name)
+        )
+    instance._loaded_image = instance.image.name or ''
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'post_ids'):
+        _deleting.post_ids = set()
+    return _deleting.post_ids
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+    search.unindex_post(instance.pk)
+    change_author_stats(instance.author_id, 'posts_count', -1)
+    change_group_posts(instance._loaded_group_id, -1)
+    bump_feeds(*post_feeds(instance, [instance._loaded_group_id]))
+    purge(post_key(instance.pk), author_key(instance.author_id))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        shift_counter(
+            Post.objects.filter(pk=instance.post_id), 'comments_count', 1
+        )
+    bump_feeds(*post_feeds(instance.post))
+    purge(post_key(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    # Каскад от поста: счётчик уйдёт вместе с постом, ленты и страницу
+    # сбросит post_deleted — один раз, а не на каждый комментарий
+    if instance.post_id in deleting_posts():
+        return
+    shift_counter(
+        Post.objects.filter(pk=instance.post_id), 'comments_count', -1
+    )
+    bump_feeds(*post_feeds(instance.post))
+    purge(post_key(instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump_feeds(INDEX_FEED, group_feed(instance.pk))
+    purge(group_key(instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        change_author_stats(instance.author_id, 'followers_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        purge(author_key(instance.author_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_author_stats(instance.author_id, 'followers_count', -1)
+    timeline.forget_author(instance.user_id, instance.author_id)
+    # Автора снова раскладывают по лентам: его посты, которые
+    # подмешивались при чтении, должны в них появиться
+    if AuthorStats.objects.filter(
+        author_id=instance.author_id,
+        followers_count=settings.TIMELINE_FANOUT_LIMIT
+    ).exists():
+        transaction.on_commit(
+            partial(timeline.schedule_backfill, instance.author_id)
+        )
+    purge(author_key(instance.author_id))
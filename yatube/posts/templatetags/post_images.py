@@ -0,0 +1,30 @@
+from django import template
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail(image):
+    """
+    Только читает готовую миниатюру. Если её ещё нет, ставит генерацию
+    в фон и возвращает None: рендер не ждёт PIL.
+    """
+    if not image:
+        return None
+    return thumbnails.page_thumbnails([image])[image.name]
+
+
+@register.simple_tag
+def page_thumbnails(posts):
+    """
+    Проставляет post.thumbnail всем постам страницы одним обращением
+    к KV-хранилищу; недостающие миниатюры ставит в генерацию.
+    Ставится внутри {% cache %}, чтобы не работать при попадании в кэш.
+    """
+    posts = list(posts)
+    built = thumbnails.page_thumbnails(post.image for post in posts)
+    for post in posts:
+        post.thumbnail = built.get(post.image.name)
+    return ''
@@ -0,0 +1,82 @@
+import datetime
+
+from django.db.models import Max
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+
+from ..admin import IndexedDatesQuerySet
+from ..models import Group, Post, User
+from ..paginator import EstimatedCountPaginator
+
+CHANGELIST_URL = reverse('admin:posts_post_changelist')
+POSTS = 12
+DATES = [
+    datetime.datetime(2021, 12, 31, 23, tzinfo=datetime.timezone.utc),
+    datetime.datetime(2022, 1, 1, 1, tzinfo=datetime.timezone.utc),
+    datetime.datetime(2022, 3, 15, tzinfo=datetime.timezone.utc),
+    datetime.datetime(2022, 3, 16, tzinfo=datetime.timezone.utc),
+]
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        # У каждого поста свои автор и группа: N+1 сразу бы вылез
+        for i in range(POSTS):
+            Post.objects.create(
+                text=f'Пост {i}',
+                author=User.objects.create_user(username=f'author{i}'),
+                group=Group.objects.create(
+                    title=f'Группа {i}', slug=f'group-{i}', description='-'
+                ),
+            )
+        for date in DATES:
+            post = Post.objects.create(text='Пост на дату', author=cls.admin)
+            Post.objects.filter(pk=post.pk).update(pub_date=date)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(CHANGELIST_URL)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        response, queries = self.changelist()
+        self.assertNotContains(response, '<select name="form-0-group"')
+        self.assertContains(response, 'Группа 0')
+        Post.objects.filter(group__slug__in=[
+            f'group-{i}' for i in range(POSTS // 2)
+        ]).delete()
+        self.assertEqual(self.changelist()[1], queries)
+
+    def test_indexed_dates_match_django(self):
+        posts = IndexedDatesQuerySet(Post)
+        for kind in ('year', 'month', 'day'):
+            for order in ('ASC', 'DESC'):
+                with self.subTest(kind=kind, order=order):
+                    self.assertEqual(
+                        posts.dates('pub_date', kind, order),
+                        list(Post.objects.dates('pub_date', kind, order))
+                    )
+
+    def test_estimated_count(self):
+        posts = Post.objects.order_by('pk')
+        last_pk = posts.aggregate(last=Max('pk'))['last']
+        for queryset, limit, count in (
+            (posts, 100, posts.count()),
+            (posts, 3, last_pk),
+            (posts.filter(text='Пост на дату'), 3, 3),
+        ):
+            with self.subTest(limit=limit, count=count):
+                paginator = EstimatedCountPaginator(queryset, 5)
+                with override_settings(PAGINATOR_ESTIMATE_EXACT_LIMIT=limit):
+                    self.assertEqual(paginator.count, count)
@@ -0,0 +1,182 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+from ..thumbnails import WIDTHS, build
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+USERNAME = 'Roman'
+GROUP_SLUG = 'test-slug'
+POSTS_COUNT = 13
+PER_PAGE = 5
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+INDEX_URL = reverse('posts:api_index')
+GROUP_URL = reverse('posts:api_posts_slug', args=[GROUP_SLUG])
+PROFILE_URL = reverse('posts:api_profile', args=[USERNAME])
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False,
+    PAGINATOR_COUNT=PER_PAGE, COMMENTS_PAGINATOR_COUNT=PER_PAGE
+)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username=USERNAME, first_name='Роман', last_name='Пекарев'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=GROUP_SLUG,
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.user, group=cls.group
+            )
+            for i in range(POSTS_COUNT)
+        ]
+        cls.post = cls.posts[-1]
+        for i in range(PER_PAGE + 1):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {i}'
+            )
+        cls.post_url = reverse('posts:api_post_detail', args=[cls.post.pk])
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        caches['thumbnails'].clear()
+        self.client = Client()
+
+    def test_feed_fields(self):
+        data = self.client.get(INDEX_URL).json()
+        self.assertEqual(data['results'][0], {
+            'id': self.post.pk,
+            'text': self.post.text,
+            'pub_date': data['results'][0]['pub_date'],
+            'author': {'username': USERNAME, 'full_name': 'Роман Пекарев'},
+            'group': {'slug': GROUP_SLUG, 'title': self.group.title},
+            'comments_count': PER_PAGE + 1,
+            'image': None,
+        })
+        self.assertEqual(
+            self.client.get(GROUP_URL).json()['group']['posts_count'],
+            POSTS_COUNT
+        )
+        author = self.client.get(PROFILE_URL).json()['author']
+        self.assertEqual(author['posts_count'], POSTS_COUNT)
+        self.assertEqual(author['followers_count'], 0)
+
+    def test_keyset_pages(self):
+        for url in (INDEX_URL, GROUP_URL, PROFILE_URL):
+            with self.subTest(url=url):
+                ids, next_url = [], url
+                while next_url:
+                    data = self.client.get(next_url).json()
+                    ids += [post['id'] for post in data['results']]
+                    next_url = data['next']
+                self.assertEqual(
+                    ids, [post.pk for post in reversed(self.posts)]
+                )
+                previous = self.client.get(data['previous']).json()
+                self.assertEqual(len(previous['results']), PER_PAGE)
+
+    def test_post_detail_with_comments(self):
+        data = self.client.get(self.post_url).json()
+        self.assertEqual(data['id'], self.post.pk)
+        comments = data['comments']
+        self.assertEqual(
+            [comment['text'] for comment in comments['results']],
+            [f'Комментарий {i}' for i in range(PER_PAGE)]
+        )
+        rest = self.client.get(comments['next']).json()['comments']
+        self.assertEqual(len(rest['results']), 1)
+        self.assertIsNone(rest['next'])
+
+    def test_not_found(self):
+        urls = [
+            reverse('posts:api_posts_slug', args=['missing']),
+            reverse('posts:api_profile', args=['missing']),
+            reverse('posts:api_post_detail', args=[0]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_not_modified(self):
+        authorized = Client()
+        authorized.force_login(self.user)
+        for client in (self.client, authorized):
+            with self.subTest(client=client):
+                response = client.get(INDEX_URL)
+                etag = response['ETag']
+                response = client.get(INDEX_URL, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+        Post.objects.create(text='Новый пост', author=self.user)
+        self.assertEqual(
+            self.client.get(INDEX_URL, HTTP_IF_NONE_MATCH=etag).status_code,
+            200
+        )
+
+    def test_thumbnail_urls(self):
+        post = Post.objects.create(
+            text='С картинкой', author=self.user, image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            )
+        )
+        # Сигнал строит миниатюры on_commit, которого в TestCase нет
+        build(post.image.name)
+        image = self.client.get(INDEX_URL).json()['results'][0]['image']
+        self.assertEqual(self.client.get(
+            reverse('posts:api_post_detail', args=[post.pk])
+        ).json()['image'], image)
+        self.assertEqual(image['width'], max(WIDTHS))
+        self.assertTrue(image['url'].startswith(settings.MEDIA_URL))
+        self.assertEqual(
+            image['srcset']['webp'].count(settings.MEDIA_URL), len(WIDTHS)
+        )
+
+    def test_queries(self):
+        cases = [
+            [INDEX_URL, 1],
+            [GROUP_URL, 2],
+            [PROFILE_URL, 2],
+            [self.post_url, 2],
+        ]
+        for url, queries in cases:
+            with self.subTest(url=url), self.assertNumQueries(queries):
+                self.client.get(url)
+
+    def test_smaller_than_html(self):
+        cases = [
+            [INDEX_URL, reverse('posts:index')],
+            [PROFILE_URL, reverse('posts:profile', args=[USERNAME])],
+        ]
+        for api_url, html_url in cases:
+            with self.subTest(url=api_url):
+                self.assertLess(
+                    len(self.client.get(api_url).content) * 3,
+                    len(self.client.get(html_url).content)
+                )
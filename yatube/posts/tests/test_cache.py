@@ -0,0 +1,131 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+
+USERNAME = 'Roman'
+GROUP_SLUG = 'test-slug'
+GROUP_SLUG_NEW = 'test-slug-new'
+PER_PAGE = 2
+
+INDEX_URL = reverse('posts:index')
+GROUP_LIST_URL = reverse('posts:posts_slug', args=[GROUP_SLUG])
+GROUP_LIST_URL_NEW = reverse('posts:posts_slug', args=[GROUP_SLUG_NEW])
+PROFILE_URL = reverse('posts:profile', args=[USERNAME])
+FEED_URLS = [INDEX_URL, GROUP_LIST_URL, PROFILE_URL]
+
+
+@override_settings(PAGINATOR_COUNT=PER_PAGE)
+class FeedCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=GROUP_SLUG,
+            description='Тестовое описание',
+        )
+        cls.group_new = Group.objects.create(
+            title='Новая группа',
+            slug=GROUP_SLUG_NEW,
+            description='Новое описание',
+        )
+        for i in range(PER_PAGE * 2):
+            Post.objects.create(
+                text=f'Пост номер {i}', author=cls.user, group=cls.group
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_pages_cached_separately(self):
+        '''Вторая страница не отдаёт закэшированную первую.'''
+        for url in FEED_URLS:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url).content
+                second = self.guest_client.get(url, {'page': 2}).content
+                self.assertNotEqual(first, second)
+
+    def test_page_normalized_in_key(self):
+        cases = [
+            [{}, {'page': 'abc'}],
+            [{'page': 2}, {'page': '02'}],
+            [{'page': 2}, {'page': 999}],
+            [{'page': 2}, {'page': 0}],
+        ]
+        for url in FEED_URLS:
+            for params, same in cases:
+                with self.subTest(url=url, params=same):
+                    self.assertEqual(
+                        self.guest_client.get(url, same).context[
+                            'feed_cache_key'
+                        ],
+                        self.guest_client.get(url, params).context[
+                            'feed_cache_key'
+                        ]
+                    )
+
+    @override_settings(PAGINATOR_CURSOR_FEEDS=('index',))
+    def test_cursor_normalized_in_key(self):
+        first = self.guest_client.get(INDEX_URL)
+        self.assertEqual(
+            self.guest_client.get(
+                INDEX_URL, {'after': 'мусор'}
+            ).context['feed_cache_key'],
+            first.context['feed_cache_key']
+        )
+        after = first.context['page_obj'].next_cursor
+        self.assertNotEqual(
+            self.guest_client.get(
+                INDEX_URL, {'after': after}
+            ).context['feed_cache_key'],
+            first.context['feed_cache_key']
+        )
+
+    def test_cached_fragment_skips_page_queries(self):
+        self.guest_client.get(INDEX_URL, {'page': 2})
+        with self.assertNumQueries(0):
+            self.guest_client.get(INDEX_URL, {'page': 2})
+
+    def test_cache_survives_until_data_changes(self):
+        for url in FEED_URLS:
+            self.guest_client.get(url)
+        # update() не шлёт сигналов: ленты обязаны остаться в кэше
+        Post.objects.update(text='Изменено без сигналов')
+        for url in FEED_URLS:
+            with self.subTest(url=url):
+                self.assertNotContains(
+                    self.guest_client.get(url), 'Изменено без сигналов'
+                )
+        Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group
+        )
+        for url in FEED_URLS:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Свежий пост')
+
+    def test_moved_post_leaves_old_group_feed(self):
+        post = Post.objects.filter(group=self.group).first()
+        self.assertContains(self.guest_client.get(GROUP_LIST_URL), post.text)
+        post.group = self.group_new
+        post.save()
+        self.assertNotContains(
+            self.guest_client.get(GROUP_LIST_URL), post.text
+        )
+        self.assertContains(
+            self.guest_client.get(GROUP_LIST_URL_NEW), post.text
+        )
+
+    def test_comment_and_delete_bump_feeds(self):
+        post = Post.objects.first()
+        before = self.guest_client.get(INDEX_URL).context['feed_cache_key']
+        Comment.objects.create(post=post, author=self.user, text='Коммент')
+        after_comment = self.guest_client.get(
+            INDEX_URL
+        ).context['feed_cache_key']
+        self.assertNotEqual(before, after_comment)
+        post.delete()
+        self.assertNotContains(self.guest_client.get(INDEX_URL), post.text)
@@ -0,0 +1,132 @@
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+
+USERNAME = 'Roman'
+PER_PAGE = 3
+COMMENTS_COUNT = 8
+
+
+@override_settings(COMMENTS_PAGINATOR_COUNT=PER_PAGE)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.quiet_post = Post.objects.create(
+            text='Тихий пост', author=cls.user
+        )
+        # bulk_create ставит всем почти одинаковый created:
+        # порядок держится на id
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=User.objects.create_user(
+                username=f'reader{i}'
+            ), text=f'Комментарий {i}')
+            for i in range(COMMENTS_COUNT)
+        )
+        Comment.objects.create(
+            post=cls.quiet_post, author=cls.user, text='Единственный'
+        )
+        cls.expected = list(
+            cls.post.comments.order_by('created', 'pk').values_list(
+                'text', flat=True
+            )
+        )
+        cls.POST_URL = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.COMMENTS_URL = reverse('posts:post_comments', args=[cls.post.pk])
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_first_screen_queries_do_not_grow(self):
+        counts = []
+        for post in (self.quiet_post, self.post):
+            with CaptureQueriesContext(connection) as queries:
+                self.guest_client.get(
+                    reverse('posts:post_detail', args=[post.pk])
+                )
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_fragments_walk_all_comments(self):
+        comments = self.guest_client.get(self.POST_URL).context['comments']
+        seen = [comment.text for comment in comments]
+        while comments.has_next():
+            response = self.guest_client.get(
+                self.COMMENTS_URL, {'after': comments.next_cursor}
+            )
+            self.assertTemplateNotUsed(response, 'base.html')
+            comments = response.context['comments']
+            seen += [comment.text for comment in comments]
+        self.assertEqual(seen, self.expected)
+
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_fragment_of_missing_post_not_found(self):
+        url = reverse('posts:post_comments', args=[self.post.pk + 1000])
+        for _ in range(2):
+            self.assertEqual(self.guest_client.get(url).status_code, 404)
+
+    def test_more_link_points_to_fragment(self):
+        response = self.guest_client.get(self.POST_URL)
+        cursor = response.context['comments'].next_cursor
+        self.assertContains(
+            response,
+            f'data-comments-more="{self.COMMENTS_URL}?after={cursor}"'
+        )
+        self.assertContains(response, f'href="{self.POST_URL}?after={cursor}')
+        self.assertNotContains(
+            self.guest_client.get(
+                reverse('posts:post_detail', args=[self.quiet_post.pk])
+            ),
+            'data-comments-more'
+        )
+
+
+class CommentFragmentTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        cls.ADD_COMMENT_URL = reverse('posts:add_comment', args=[cls.post.pk])
+        cls.POST_URL = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_fragment_mode_returns_new_comment(self):
+        for url, headers in [
+            (f'{self.ADD_COMMENT_URL}?fragment=1', {}),
+            (self.ADD_COMMENT_URL, {'HTTP_ACCEPT': 'text/html-fragment'}),
+        ]:
+            with self.subTest(url=url, headers=headers):
+                response = self.authorized_client.post(
+                    url, {'text': f'Фрагмент {url}'}, **headers
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, f'Фрагмент {url}')
+                self.assertTemplateUsed(
+                    response, 'posts/includes/comment_item.html'
+                )
+                self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(self.post.comments.count(), 2)
+
+    def test_invalid_fragment_is_bad_request(self):
+        response = self.authorized_client.post(
+            f'{self.ADD_COMMENT_URL}?fragment=1', {'text': ''}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.post.comments.exists())
+
+    def test_redirect_stays_default(self):
+        self.assertRedirects(
+            self.authorized_client.post(
+                self.ADD_COMMENT_URL, {'text': 'Обычный комментарий'}
+            ),
+            self.POST_URL
+        )
@@ -0,0 +1,112 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Group, Post, User
+
+USERNAME = 'Roman'
+GROUP_SLUG = 'test-slug'
+GROUP_SLUG_NEW = 'test-slug-new'
+POST_TEXT = 'Текст поста'
+COMMENT_TEXT = 'Текст комментария'
+
+CREATE_URL = reverse('posts:post_create')
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=GROUP_SLUG,
+            description='Тестовое описание',
+        )
+        cls.group_new = Group.objects.create(
+            title='Новая группа',
+            slug=GROUP_SLUG_NEW,
+            description='Новое описание',
+        )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def check_counters(self, author_posts, group_posts, group_new_posts):
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count,
+            author_posts
+        )
+        self.assertEqual(
+            Group.objects.get(pk=self.group.pk).posts_count, group_posts
+        )
+        self.assertEqual(
+            Group.objects.get(pk=self.group_new.pk).posts_count,
+            group_new_posts
+        )
+
+    def test_post_lifecycle_updates_counters(self):
+        self.authorized_client.post(
+            CREATE_URL, {'text': POST_TEXT, 'group': self.group.pk}
+        )
+        post = Post.objects.get()
+        self.check_counters(1, 1, 0)
+        post.group = self.group_new
+        post.save()
+        self.check_counters(1, 0, 1)
+        post.delete()
+        self.check_counters(0, 0, 0)
+
+    def test_comments_counter(self):
+        post = Post.objects.create(author=self.user, text=POST_TEXT)
+        self.authorized_client.post(
+            reverse('posts:add_comment', args=[post.pk]),
+            {'text': COMMENT_TEXT}
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        # Сохранение поста не затирает счётчик устаревшим значением
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.user, text='Ещё')
+        stale.text = 'Правка'
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        Comment.objects.filter(post=post).first().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_cascade_cost_independent_of_comments(self):
+        queries = []
+        for comments in (1, 5):
+            post = Post.objects.create(author=self.user, text=POST_TEXT)
+            for i in range(comments):
+                Comment.objects.create(
+                    post=post, author=self.user, text=COMMENT_TEXT
+                )
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_recount_repairs_drift(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text=POST_TEXT, group=self.group)
+            for _ in range(3)
+        )
+        Comment.objects.create(
+            post=Post.objects.first(), author=self.user, text=COMMENT_TEXT
+        )
+        Post.objects.update(comments_count=5)
+        call_command('recount_posts', batch_size=2, stdout=StringIO())
+        self.check_counters(3, 3, 0)
+        self.assertEqual(
+            sorted(Post.objects.values_list('comments_count', flat=True)),
+            [0, 0, 1]
+        )
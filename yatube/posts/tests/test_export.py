@@ -0,0 +1,154 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+USERNAME = 'Roman'
+OTHER = 'Pekarev'
+GROUP_SLUG = 'test-slug'
+IMAGE = 'posts/export.gif'
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+POSTS_COUNT = 5
+
+PROFILE_EXPORT_URL = reverse('posts:profile_export', args=[USERNAME])
+GROUP_EXPORT_URL = reverse('posts:group_export', args=[GROUP_SLUG])
+
+
+def content(response):
+    return b''.join(response.streaming_content)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, EXPORT_CHUNK_SIZE=2)
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.other = User.objects.create_user(username=OTHER)
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=GROUP_SLUG,
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.user, group=cls.group
+            )
+            for i in range(POSTS_COUNT)
+        ]
+        Post.objects.create(text='Чужой пост', author=cls.other)
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.other, text='Комментарий'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def test_jsonl_export(self):
+        response = self.author_client.get(PROFILE_EXPORT_URL)
+        self.assertTrue(response.streaming)
+        self.assertIn(
+            f'posts-{USERNAME}.jsonl', response['Content-Disposition']
+        )
+        rows = [
+            json.loads(line)
+            for line in content(response).decode().splitlines()
+        ]
+        self.assertEqual(
+            [(row['type'], row['text']) for row in rows],
+            [('post', post.text) for post in self.posts]
+            + [('comment', self.comment.text)]
+        )
+        self.assertEqual(rows[0]['group'], GROUP_SLUG)
+        self.assertEqual(rows[-1]['post'], self.posts[0].pk)
+
+    def test_csv_export(self):
+        response = self.author_client.get(
+            PROFILE_EXPORT_URL, {'format': 'csv'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(content(response).decode())))
+        self.assertEqual(len(rows), POSTS_COUNT + 1)
+        self.assertEqual(rows[0]['author'], USERNAME)
+
+    def test_zip_with_images(self):
+        default_storage.save(IMAGE, ContentFile(SMALL_GIF))
+        # update() без сигналов: миниатюры здесь не нужны
+        Post.objects.filter(pk=self.posts[1].pk).update(image=IMAGE)
+        response = self.author_client.get(PROFILE_EXPORT_URL, {'images': 1})
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(content(response))) as archive:
+            self.assertEqual(
+                archive.namelist(),
+                [f'posts-{USERNAME}.jsonl', f'images/{IMAGE}']
+            )
+            self.assertEqual(archive.read(f'images/{IMAGE}'), SMALL_GIF)
+            self.assertEqual(len(archive.read(
+                f'posts-{USERNAME}.jsonl'
+            ).splitlines()), POSTS_COUNT + 1)
+
+    def test_queries_run_while_streaming(self):
+        with self.assertNumQueries(3):
+            response = self.author_client.get(PROFILE_EXPORT_URL)
+        # По запросу на посты и комментарии, строки читаются кусками
+        with self.assertNumQueries(2):
+            content(response)
+
+    def test_access(self):
+        other_client = Client()
+        other_client.force_login(self.other)
+        staff_client = Client()
+        staff_client.force_login(self.staff)
+        cases = [
+            [Client(), PROFILE_EXPORT_URL, 302],
+            [other_client, PROFILE_EXPORT_URL, 403],
+            [other_client, GROUP_EXPORT_URL, 403],
+            [self.author_client, GROUP_EXPORT_URL, 403],
+            [staff_client, PROFILE_EXPORT_URL, 200],
+            [staff_client, GROUP_EXPORT_URL, 200],
+            [self.author_client, PROFILE_EXPORT_URL + '?format=xml', 400],
+        ]
+        for client, url, status in cases:
+            with self.subTest(url=url, status=status):
+                self.assertEqual(client.get(url).status_code, status)
+
+    def test_command_round_trip_through_import(self):
+        path = os.path.join(TEMP_MEDIA_ROOT, 'group.jsonl')
+        call_command(
+            'export_posts', path, group=GROUP_SLUG, stdout=StringIO()
+        )
+        texts = set(self.group.posts.values_list('text', flat=True))
+        Post.objects.filter(group=self.group).delete()
+        call_command('import_posts', path, stdout=StringIO())
+        self.assertEqual(
+            set(self.group.posts.values_list('text', flat=True)), texts
+        )
+        self.assertFalse(Comment.objects.exists())
@@ -0,0 +1,163 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import AuthorStats, Follow, Post, TimelineEntry, User
+
+USERNAME = 'Roman'
+AUTHOR = 'Pekarev'
+STAR = 'Star'
+PER_PAGE = 3
+
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+FOLLOW_URL = reverse('posts:profile_follow', args=[AUTHOR])
+UNFOLLOW_URL = reverse('posts:profile_unfollow', args=[AUTHOR])
+SELF_FOLLOW_URL = reverse('posts:profile_follow', args=[USERNAME])
+AUTHOR_PROFILE_URL = reverse('posts:profile', args=[AUTHOR])
+
+
+def followers(author):
+    return AuthorStats.objects.get(author=author).followers_count
+
+
+class FollowTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.post = Post.objects.create(text='Старый пост', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_follow_and_unfollow(self):
+        self.assertRedirects(self.client.post(FOLLOW_URL), AUTHOR_PROFILE_URL)
+        self.client.post(FOLLOW_URL)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(followers(self.author), 1)
+        self.assertContains(
+            self.client.get(AUTHOR_PROFILE_URL), 'Отписаться'
+        )
+        self.assertRedirects(
+            self.client.post(UNFOLLOW_URL), AUTHOR_PROFILE_URL
+        )
+        self.assertFalse(Follow.objects.exists())
+        self.assertEqual(followers(self.author), 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_cannot_follow_self_or_by_get(self):
+        self.client.post(SELF_FOLLOW_URL)
+        self.assertEqual(self.client.get(FOLLOW_URL).status_code, 405)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_anonymous_redirected_to_login(self):
+        for url in [FOLLOW_INDEX_URL, FOLLOW_URL, UNFOLLOW_URL]:
+            with self.subTest(url=url):
+                response = Client().post(url)
+                self.assertEqual(response.status_code, 302)
+                self.assertIn(reverse('users:login'), response.url)
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        self.client.post(FOLLOW_URL)
+        fresh = Post.objects.create(text='Свежий пост', author=self.author)
+        Post.objects.create(
+            text='Чужой пост',
+            author=User.objects.create_user(username='stranger')
+        )
+        response = self.client.get(FOLLOW_INDEX_URL)
+        self.assertEqual(
+            list(response.context['page_obj']), [fresh, self.post]
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 2
+        )
+
+    def test_trim_keeps_newest_entries(self):
+        self.client.post(FOLLOW_URL)
+        newest = [
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+            for i in range(3)
+        ][::-1]
+        out = StringIO()
+        call_command('trim_timelines', length=2, stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(
+            [entry.post for entry in TimelineEntry.objects.filter(
+                user=self.user
+            ).order_by('-pub_date', '-post')],
+            newest[:2]
+        )
+
+
+@override_settings(PAGINATOR_COUNT=PER_PAGE, TIMELINE_FANOUT_LIMIT=1)
+class TimelineReadTest(TestCase):
+    """Разложенные записи и посты популярного автора в одной ленте."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.author = User.objects.create_user(username=AUTHOR)
+        cls.star = User.objects.create_user(username=STAR)
+        Follow.objects.create(user=cls.user, author=cls.author)
+        Follow.objects.create(user=cls.user, author=cls.star)
+        Follow.objects.create(
+            user=User.objects.create_user(username='fan'), author=cls.star
+        )
+        for i in range(4):
+            Post.objects.create(text=f'Пост {i}', author=cls.author)
+            Post.objects.create(text=f'Звёздный пост {i}', author=cls.star)
+        cls.expected = list(Post.objects.filter(
+            author__in=[cls.author, cls.star]
+        ).order_by('-pub_date', '-pk'))
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_popular_author_is_not_fanned_out(self):
+        self.assertFalse(
+            TimelineEntry.objects.filter(author=self.star).exists()
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(author=self.author).count(), 4
+        )
+
+    def test_backfilled_when_no_longer_popular(self):
+        # В TestCase коммита нет: отложенное выполняем сразу
+        with mock.patch(
+            'django.db.transaction.on_commit', lambda func, using=None: func()
+        ):
+            Follow.objects.filter(
+                author=self.star, user__username='fan'
+            ).delete()
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                user=self.user, author=self.star
+            ).count(), 4
+        )
+        self.assertEqual(
+            list(self.client.get(FOLLOW_INDEX_URL).context['page_obj']),
+            self.expected[:PER_PAGE]
+        )
+
+    def test_pages_walk_whole_timeline(self):
+        page = self.client.get(FOLLOW_INDEX_URL).context['page_obj']
+        seen = list(page)
+        while page.has_next():
+            page = self.client.get(
+                FOLLOW_INDEX_URL, {'after': page.next_cursor}
+            ).context['page_obj']
+            seen += list(page)
+        self.assertEqual(seen, self.expected)
+        previous = self.client.get(
+            FOLLOW_INDEX_URL, {'before': page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(
+            list(previous), self.expected[-len(page) - PER_PAGE:-len(page)]
+        )
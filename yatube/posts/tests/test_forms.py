@@ -1,10 +1,15 @@
+import os
 import shutil
 import tempfile
+from unittest import mock
 
 from django import forms
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.db import OperationalError
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings
+)
 from django.urls import reverse
 
 from ..models import Group, Post, User, Comment
@@ -28,6 +33,15 @@ POST_TEXT = 'Текстовая пост'
 NEW_POST_TEXT = 'Новый текст'
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+RETRY_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -142,3 +156,41 @@ class PostCreateFormTests(TestCase):
                 with self.subTest(value=value):
                     form_field = response.context.get('form').fields.get(value)
                     self.assertIsInstance(form_field, expected_value)
+
+
+@override_settings(
+    MEDIA_ROOT=RETRY_MEDIA_ROOT, THUMBNAIL_BUILD=False,
+    DB_WRITE_RETRIES=2, DB_WRITE_RETRY_DELAY=0
+)
+class RetriedPostCreateTest(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(RETRY_MEDIA_ROOT, ignore_errors=True)
+
+    def test_image_stored_once_when_save_retried(self):
+        user = User.objects.create_user(username=USERNAME)
+        client = Client()
+        client.force_login(user)
+        save = Post.save
+        calls = []
+
+        def locked_once(post, *args, **kwargs):
+            calls.append(post)
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return save(post, *args, **kwargs)
+
+        with mock.patch.object(Post, 'save', locked_once):
+            client.post(CREATE_URL, {
+                'text': POST_TEXT,
+                'image': SimpleUploadedFile(
+                    'retried.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            })
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Post.objects.get().image.name, 'posts/retried.gif')
+        self.assertEqual(
+            os.listdir(os.path.join(RETRY_MEDIA_ROOT, 'posts')),
+            ['retried.gif']
+        )
@@ -0,0 +1,156 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import AuthorStats, Follow, Group, Post, TimelineEntry, User
+from ..search import match_expression, ranked_ids
+
+TEMP_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+USERNAME = 'Roman'
+READER = 'reader'
+GROUP_SLUG = 'imported'
+PUB_DATE = datetime(2021, 3, 4, 5, 6, tzinfo=timezone.utc)
+
+RECORDS = [
+    {
+        'id': '1', 'author': USERNAME, 'text': 'Первый импортированный',
+        'group': GROUP_SLUG, 'pub_date': PUB_DATE.isoformat(),
+    },
+    {'id': '2', 'author': USERNAME, 'text': 'Второй импортированный'},
+    {'id': '3', 'author': 'newcomer', 'text': 'От нового автора'},
+    # Без id: ключ по содержимому
+    {'author': 'newcomer', 'text': 'Без ключа', 'group': GROUP_SLUG},
+]
+BROKEN = [
+    {'id': '4', 'author': USERNAME},
+    {'id': '5', 'author': USERNAME, 'text': 'Дата', 'pub_date': 'вчера'},
+    {'id': '6', 'author': [USERNAME], 'text': 'Автор списком'},
+    {'id': '7', 'author': USERNAME, 'text': 'Группа', 'group': 'Python Dev'},
+]
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        Follow.objects.create(
+            user=User.objects.create_user(username=READER), author=cls.user
+        )
+        cls.jsonl = os.path.join(TEMP_DIR, 'posts.jsonl')
+        with open(cls.jsonl, 'w', encoding='utf-8') as output:
+            for record in RECORDS + BROKEN:
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            output.write('{не json\n')
+        cls.csv = os.path.join(TEMP_DIR, 'posts.csv')
+        with open(cls.csv, 'w', encoding='utf-8', newline='') as output:
+            writer = csv.DictWriter(output, fieldnames=[
+                'id', 'author', 'text', 'group', 'pub_date'
+            ])
+            writer.writeheader()
+            writer.writerows(RECORDS)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def run_import(self, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_posts', path, batch_size=2, stdout=out, stderr=err,
+            **options
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_jsonl_import(self):
+        out, err = self.run_import(self.jsonl)
+        self.assertIn(f'Импортировано: {len(RECORDS)}', out)
+        self.assertIn('с ошибками: 5', out)
+        self.assertIn('записей/с', out)
+        self.assertEqual(err.count('Строка'), 5)
+        first = Post.objects.get(text='Первый импортированный')
+        self.assertEqual(first.pub_date, PUB_DATE)
+        self.assertEqual(first.author, self.user)
+        self.assertEqual(first.group.slug, GROUP_SLUG)
+        self.assertTrue(User.objects.filter(username='newcomer').exists())
+        self.assertFalse(Group.objects.filter(slug='Python Dev').exists())
+        self.assertEqual(Client().get(reverse('posts:index')).status_code, 200)
+
+    def test_derived_data_refreshed(self):
+        # Закэшированная до импорта лента должна обновиться
+        Client().get(reverse('posts:index'))
+        self.run_import(self.jsonl)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 2
+        )
+        self.assertEqual(Group.objects.get(slug=GROUP_SLUG).posts_count, 2)
+        found = [pk for pk, _ in ranked_ids(
+            match_expression('импортированный'), len(RECORDS)
+        )]
+        self.assertEqual(
+            set(Post.objects.filter(pk__in=found).values_list(
+                'text', flat=True
+            )),
+            {'Первый импортированный', 'Второй импортированный'}
+        )
+        self.assertEqual(TimelineEntry.objects.filter(
+            user__username=READER
+        ).count(), 2)
+        self.assertContains(
+            Client().get(reverse('posts:index')), 'От нового автора'
+        )
+
+    def test_repeated_import_skips_duplicates(self):
+        self.run_import(self.jsonl)
+        for path in (self.jsonl, self.csv):
+            with self.subTest(path=path):
+                out, _ = self.run_import(path)
+                self.assertIn('Импортировано: 0', out)
+                self.assertIn(f'дубликатов: {len(RECORDS)}', out)
+        self.assertEqual(Post.objects.count(), len(RECORDS))
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 2
+        )
+
+    def test_sources_do_not_collide(self):
+        self.run_import(self.csv)
+        out, _ = self.run_import(self.csv, source='other')
+        self.assertIn(f'Импортировано: {len(RECORDS)}', out)
+
+    def test_interrupted_import_keeps_committed_batches(self):
+        Client().get(reverse('posts:index'))
+        with mock.patch(
+            'posts.management.commands.seed_yatube.fan_out_range',
+            side_effect=[None, RuntimeError('обрыв')]
+        ), self.assertRaises(RuntimeError):
+            self.run_import(self.csv)
+        # Первая пачка закоммичена вместе со счётчиками, вторая откатилась
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 2
+        )
+        self.assertContains(
+            Client().get(reverse('posts:index')), 'Второй импортированный'
+        )
+
+    def test_deleted_pk_not_reused(self):
+        top = Post.objects.create(text='Удалённый', author=self.user).pk
+        Post.objects.filter(pk=top).delete()
+        self.run_import(self.csv)
+        self.assertGreater(Post.objects.order_by('pk').first().pk, top)
@@ -0,0 +1,189 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import parse_http_date
+
+from core.pagecache import purge
+from ..cache import post_key
+from ..models import Comment, Group, Post, User
+
+USERNAME = 'Roman'
+GROUP_SLUG = 'test-slug'
+
+INDEX_URL = reverse('posts:index')
+GROUP_LIST_URL = reverse('posts:posts_slug', args=[GROUP_SLUG])
+PROFILE_URL = reverse('posts:profile', args=[USERNAME])
+ABOUT_URL = reverse('about:author')
+FEED_URLS = [INDEX_URL, GROUP_LIST_URL, PROFILE_URL]
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=GROUP_SLUG,
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group
+        )
+        cls.other_post = Post.objects.create(
+            text='Другой пост', author=cls.user
+        )
+        cls.POST_URL = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.OTHER_POST_URL = reverse(
+            'posts:post_detail', args=[cls.other_post.pk]
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    def test_second_request_skips_view(self):
+        for url in FEED_URLS + [self.POST_URL, ABOUT_URL]:
+            with self.subTest(url=url):
+                content = self.guest_client.get(url).content
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(url)
+                self.assertIsNone(response.context)
+                self.assertEqual(response.content, content)
+
+    def test_new_post_purges_its_feeds(self):
+        for url in FEED_URLS + [self.OTHER_POST_URL]:
+            self.guest_client.get(url)
+        Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group
+        )
+        for url in FEED_URLS:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Свежий пост')
+        # Страница поста показывает число постов автора
+        self.assertIsNotNone(
+            self.guest_client.get(self.OTHER_POST_URL).context
+        )
+
+    def test_comment_purges_only_its_post(self):
+        self.guest_client.get(self.POST_URL)
+        self.guest_client.get(self.OTHER_POST_URL)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Свежий комментарий'
+        )
+        self.assertContains(
+            self.guest_client.get(self.POST_URL), 'Свежий комментарий'
+        )
+        self.assertIsNone(self.guest_client.get(self.OTHER_POST_URL).context)
+
+    def test_group_change_purges_group_pages(self):
+        self.guest_client.get(GROUP_LIST_URL)
+        self.guest_client.get(self.POST_URL)
+        self.group.title = 'Новое название'
+        self.group.save()
+        for url in [GROUP_LIST_URL, self.POST_URL]:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), 'Новое название'
+                )
+        self.group.title = 'Тестовая группа'
+        self.group.save()
+
+    def test_authenticated_pages_not_cached(self):
+        self.author_client.get(INDEX_URL)
+        self.assertIsNotNone(self.author_client.get(INDEX_URL).context)
+        self.assertIsNotNone(self.guest_client.get(INDEX_URL).context)
+
+    @override_settings(PAGE_CACHE_PROXY_HEADERS=True)
+    def test_proxy_headers(self):
+        for response in [
+            self.guest_client.get(self.POST_URL),
+            self.guest_client.get(self.POST_URL),
+        ]:
+            self.assertIn('public', response['Cache-Control'])
+            self.assertEqual(response['Surrogate-Key'], ' '.join(sorted([
+                f'author:{self.user.pk}',
+                f'group:{self.group.pk}',
+                f'post:{self.post.pk}',
+            ])))
+        response = self.author_client.get(self.POST_URL)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertFalse(response.has_header('Surrogate-Key'))
+
+    def test_conditional_get(self):
+        response = self.guest_client.get(self.POST_URL)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        for headers in [
+            {'HTTP_IF_NONE_MATCH': etag},
+            {'HTTP_IF_MODIFIED_SINCE': last_modified},
+        ]:
+            with self.subTest(headers=headers):
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(self.POST_URL, **headers)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response['ETag'], etag)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Свежий комментарий'
+        )
+        response = self.guest_client.get(
+            self.POST_URL, HTTP_IF_NONE_MATCH=etag,
+            HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertGreater(
+            parse_http_date(response['Last-Modified']),
+            parse_http_date(last_modified)
+        )
+        self.assertEqual(self.guest_client.get(
+            self.POST_URL, HTTP_IF_MODIFIED_SINCE=last_modified
+        ).status_code, 200)
+
+    def test_conditional_get_logged_in(self):
+        # Первый ответ ставит CSRF-куку, и ETag дальше учитывает её
+        self.author_client.get(self.POST_URL)
+        for url in FEED_URLS + [self.POST_URL]:
+            with self.subTest(url=url):
+                etag = self.author_client.get(url)['ETag']
+                response = self.author_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertIsNone(response.context)
+        etag = self.author_client.get(self.POST_URL)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Свежий комментарий'
+        )
+        response = self.author_client.get(
+            self.POST_URL, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertContains(response, 'Свежий комментарий')
+        self.assertNotEqual(response['ETag'], etag)
+        # Чужая страница с тем же адресом не совпадает по ETag
+        reader = Client()
+        reader.force_login(User.objects.create_user(username='reader'))
+        self.assertEqual(reader.get(
+            self.POST_URL, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code, 200)
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_conditional_get_without_page_cache(self):
+        etag = self.guest_client.get(INDEX_URL)['ETag']
+        self.assertEqual(self.guest_client.get(
+            INDEX_URL, HTTP_IF_NONE_MATCH=etag
+        ).status_code, 304)
+        Post.objects.create(text='Свежий пост', author=self.user)
+        self.assertContains(self.guest_client.get(
+            INDEX_URL, HTTP_IF_NONE_MATCH=etag
+        ), 'Свежий пост')
+
+    def test_unchanged_page_keeps_validators(self):
+        response = self.guest_client.get(self.OTHER_POST_URL)
+        # Страница сброшена, но после рендера её текст тот же
+        purge(post_key(self.other_post.pk))
+        self.assertEqual(self.guest_client.get(
+            self.OTHER_POST_URL, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code, 304)
@@ -0,0 +1,251 @@
+from django.core.cache import cache
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from ..paginator import (
+    COUNT_STRATEGIES, CursorPaginator, ElidedPaginator, count_strategy,
+    decode_cursor
+)
+
+USERNAME = 'Roman'
+GROUP_SLUG = 'test-slug'
+PER_PAGE = 3
+POSTS_COUNT = 8
+GROUP_POSTS = 5
+
+INDEX_URL = reverse('posts:index')
+GROUP_LIST_URL = reverse('posts:posts_slug', args=[GROUP_SLUG])
+PROFILE_URL = reverse('posts:profile', args=[USERNAME])
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=GROUP_SLUG,
+            description='Тестовое описание',
+        )
+        # bulk_create ставит всем постам почти одинаковый pub_date,
+        # поэтому порядок держится на id
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user, group=cls.group)
+            for i in range(POSTS_COUNT)
+        )
+        cls.expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+
+    def test_walk_forward_and_back(self):
+        '''Курсоры проходят ленту вперёд и назад без пропусков.'''
+        seen = []
+        page = self.paginator.get_page()
+        self.assertFalse(page.has_previous())
+        pages = [page]
+        while True:
+            seen += [post.pk for post in page]
+            if not page.has_next():
+                break
+            page = self.paginator.get_page(after=page.next_cursor)
+            pages.append(page)
+        self.assertEqual(seen, self.expected)
+        back = self.paginator.get_page(before=pages[-1].previous_cursor)
+        self.assertEqual(
+            [post.pk for post in back], [post.pk for post in pages[-2]]
+        )
+
+    def test_broken_cursor_gives_first_page(self):
+        for token in ['', 'garbage', '!!!', 'MjAyMHxhYmM']:
+            with self.subTest(token=token):
+                self.assertIsNone(decode_cursor(token))
+                page = self.paginator.get_page(after=token)
+                self.assertEqual(
+                    [post.pk for post in page], self.expected[:PER_PAGE]
+                )
+
+    def test_cursor_pages_have_no_count(self):
+        token = self.paginator.get_page().next_cursor
+        with self.assertNumQueries(0):
+            next_page = self.paginator.get_page(after=token)
+        with self.assertNumQueries(1):
+            list(next_page)
+            next_page.has_next()
+
+    @override_settings(
+        PAGINATOR_COUNT=PER_PAGE,
+        PAGINATOR_CURSOR_FEEDS=('index', 'group', 'profile'),
+    )
+    def test_feeds_opt_into_cursor(self):
+        for url in [INDEX_URL, GROUP_LIST_URL, PROFILE_URL]:
+            with self.subTest(url=url):
+                page_obj = self.guest_client.get(url).context['page_obj']
+                self.assertEqual(len(page_obj), PER_PAGE)
+                response = self.guest_client.get(
+                    url, {'after': page_obj.next_cursor}
+                )
+                self.assertEqual(
+                    [post.pk for post in response.context['page_obj']],
+                    self.expected[PER_PAGE:PER_PAGE * 2]
+                )
+
+
+class ElidedPaginatorTest(SimpleTestCase):
+    def page_range(self, count, number):
+        paginator = ElidedPaginator(range(count), 1)
+        return list(paginator.get_page(number).elided_page_range)
+
+    def test_window_around_current_page(self):
+        ellipsis = ElidedPaginator.ELLIPSIS
+        cases = [
+            [5, 3, [1, 2, 3, 4, 5]],
+            [100, 1, [1, 2, 3, 4, ellipsis, 99, 100]],
+            [100, 50, [
+                1, 2, ellipsis, 47, 48, 49, 50, 51, 52, 53, ellipsis, 99, 100
+            ]],
+            [100, 97, [1, 2, ellipsis, 94, 95, 96, 97, 98, 99, 100]],
+            [10, 6, [1, 2, 3, 4, 5, 6, 7, 8, 9, 10]],
+        ]
+        for count, number, expected in cases:
+            with self.subTest(count=count, number=number):
+                self.assertEqual(self.page_range(count, number), expected)
+
+    def render(self, count):
+        """HTML навигации по средней странице."""
+        page_obj = ElidedPaginator(range(count), 10).get_page(count // 20)
+        return render_to_string(
+            'posts/includes/paginator.html', {'page_obj': page_obj}
+        )
+
+    def test_navigation_stays_flat_as_posts_grow(self):
+        small_html = self.render(1000)
+        for count in [50000, 500000]:
+            with self.subTest(count=count):
+                html = self.render(count)
+                # Разница только в числе цифр в номерах страниц
+                self.assertLess(len(html) - len(small_html), 200)
+                self.assertEqual(html.count('<li'), small_html.count('<li'))
+
+
+def fixed_count(queryset, feed, owner):
+    return 42
+
+
+class CountStrategiesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=GROUP_SLUG,
+            description='Тестовое описание',
+        )
+        # Через save(): счётчики ведут сигналы
+        for i in range(POSTS_COUNT):
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.user,
+                group=cls.group if i < GROUP_POSTS else None
+            )
+        # Счётчики сдвигаются через F(): владельцы лент — свежие из базы
+        cls.group.refresh_from_db()
+        cls.feeds = [
+            ['index', Post.objects.all(), None],
+            ['group', cls.group.posts.all(), cls.group],
+            ['profile', cls.user.posts.all(), User.objects.select_related(
+                'stats'
+            ).get(pk=cls.user.pk)],
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_strategies_agree_with_count(self):
+        for name, strategy in COUNT_STRATEGIES.items():
+            for feed, queryset, owner in self.feeds:
+                with self.subTest(strategy=name, feed=feed):
+                    self.assertEqual(
+                        strategy(queryset, feed, owner), queryset.count()
+                    )
+
+    def test_counter_never_undercounts(self):
+        counter = COUNT_STRATEGIES['counter']
+        queryset = self.group.posts.all()
+        with self.assertNumQueries(1):
+            # Счётчик из уже загруженной группы, точно — не дальше предела
+            self.assertEqual(
+                counter(queryset, 'group', self.group), GROUP_POSTS
+            )
+        Group.objects.update(posts_count=0)
+        group = Group.objects.get(pk=self.group.pk)
+        self.assertEqual(counter(queryset, 'group', group), GROUP_POSTS)
+        group.posts_count = GROUP_POSTS * 10
+        with override_settings(PAGINATOR_ESTIMATE_EXACT_LIMIT=2):
+            self.assertEqual(
+                counter(queryset, 'group', group), GROUP_POSTS * 10
+            )
+
+    def test_cached_count_reset_by_new_post(self):
+        cached = COUNT_STRATEGIES['cached']
+        queryset = self.group.posts.all()
+        cached(queryset, 'group', self.group)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                cached(queryset, 'group', self.group), GROUP_POSTS
+            )
+        Post.objects.create(text='Свежий', author=self.user, group=self.group)
+        self.assertEqual(
+            cached(queryset, 'group', self.group), GROUP_POSTS + 1
+        )
+
+    def test_estimate_never_undercounts(self):
+        estimate = COUNT_STRATEGIES['estimate']
+        posts = Post.objects.all()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE posts_post')
+        Post.objects.create(text='После ANALYZE', author=self.user)
+        with self.assertNumQueries(1):
+            # Статистика ANALYZE устарела, MAX(id) — нет
+            self.assertEqual(estimate(posts, 'index', None), POSTS_COUNT + 1)
+        with override_settings(PAGINATOR_ESTIMATE_EXACT_LIMIT=2):
+            self.assertEqual(
+                estimate(self.group.posts.all(), 'group', self.group),
+                GROUP_POSTS
+            )
+        posts.order_by('pk').first().delete()
+        self.assertGreaterEqual(estimate(posts, 'index', None), posts.count())
+
+    @override_settings(PAGINATOR_COUNT_STRATEGIES={
+        'index': f'{__name__}.fixed_count',
+    })
+    def test_strategy_selected_per_feed(self):
+        self.assertIs(count_strategy('index'), fixed_count)
+        self.assertIs(count_strategy('group'), COUNT_STRATEGIES['exact'])
+
+    @override_settings(PAGINATOR_COUNT=PER_PAGE)
+    def test_navigation_reaches_last_page(self):
+        for url, count in [
+            [INDEX_URL, POSTS_COUNT],
+            [GROUP_LIST_URL, GROUP_POSTS],
+            [PROFILE_URL, POSTS_COUNT],
+        ]:
+            with self.subTest(url=url):
+                page_obj = self.guest_client.get(url).context['page_obj']
+                last = page_obj.paginator.num_pages
+                self.assertEqual(last, -(-count // PER_PAGE))
+                response = self.guest_client.get(url, {'page': last})
+                self.assertEqual(
+                    len(response.context['page_obj']),
+                    count - (last - 1) * PER_PAGE
+                )
@@ -12,6 +12,17 @@ ROUTES = [
     [f'/profile/{USERNAME}/', 'profile', [USERNAME]],
     [f'/posts/{ID}/', 'post_detail', [ID]],
     [f'/posts/{ID}/edit/', 'post_edit', [ID]],
+    [f'/posts/{ID}/comments/', 'post_comments', [ID]],
+    ['/search/', 'search', []],
+    ['/follow/', 'follow_index', []],
+    [f'/group/{SLUG}/export/', 'group_export', [SLUG]],
+    [f'/profile/{USERNAME}/export/', 'profile_export', [USERNAME]],
+    [f'/profile/{USERNAME}/follow/', 'profile_follow', [USERNAME]],
+    [f'/profile/{USERNAME}/unfollow/', 'profile_unfollow', [USERNAME]],
+    ['/api/posts/', 'api_index', []],
+    [f'/api/group/{SLUG}/', 'api_posts_slug', [SLUG]],
+    [f'/api/profile/{USERNAME}/', 'api_profile', [USERNAME]],
+    [f'/api/posts/{ID}/', 'api_post_detail', [ID]],
 ]
 
 
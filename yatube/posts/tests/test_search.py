@@ -0,0 +1,141 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, User
+from ..search import FTS_TABLE
+
+USERNAME = 'Roman'
+PER_PAGE = 3
+POSTS = 8
+
+SEARCH_URL = reverse('posts:search')
+ADMIN_URL = reverse('admin:posts_post_changelist')
+
+
+@override_settings(PAGINATOR_COUNT=PER_PAGE)
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.posts = [
+            Post.objects.create(
+                text=f'Котики гуляют {i}' + ' котики' * i, author=cls.user
+            )
+            for i in range(POSTS)
+        ]
+        cls.other = Post.objects.create(
+            text='Собаки спят', author=cls.user
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        return self.guest_client.get(SEARCH_URL, {'q': query, **params})
+
+    def test_finds_by_word_prefix_case_insensitive(self):
+        for query, expected in (
+            ('КОТ', self.posts),
+            ('собак', [self.other]),
+            ('котики спят', []),
+            ('"*) OR NEAR(', []),
+            ('', []),
+        ):
+            with self.subTest(query=query):
+                found = set()
+                response = self.search(query)
+                while True:
+                    page = response.context['page_obj']
+                    found.update(post.pk for post in page)
+                    if not page.has_next():
+                        break
+                    response = self.search(query, after=page.next_cursor)
+                self.assertEqual(found, {post.pk for post in expected})
+
+    def test_results_ranked_and_paged_by_cursor(self):
+        first = self.search('котики').context['page_obj']
+        self.assertEqual(first[0], self.posts[-1])
+        second = self.search(
+            'котики', after=first.next_cursor
+        ).context['page_obj']
+        self.assertTrue(second.has_previous())
+        self.assertEqual(
+            list(self.search(
+                'котики', before=second.previous_cursor
+            ).context['page_obj']),
+            list(first)
+        )
+        ranks = [post.search_rank for post in list(first) + list(second)]
+        self.assertEqual(ranks, sorted(ranks))
+
+    @override_settings(SEARCH_MAX_RESULTS=PER_PAGE * 2)
+    def test_depth_capped(self):
+        first = self.search('котики').context['page_obj']
+        second = self.search(
+            'котики', after=first.next_cursor
+        ).context['page_obj']
+        self.assertEqual(len(second), PER_PAGE)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            list(self.search(
+                'котики', before=second.previous_cursor
+            ).context['page_obj']),
+            list(first)
+        )
+
+    def test_index_follows_edit_and_delete(self):
+        post = self.posts[0]
+        post.text = 'Попугаи летают'
+        post.save()
+        self.assertEqual(list(self.search('попуга').context['page_obj']),
+                         [post])
+        post.delete()
+        self.assertEqual(list(self.search('попуга').context['page_obj']),
+                         [])
+
+    def test_rebuild_command_restores_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        self.assertFalse(self.search('собаки').context['page_obj'])
+        call_command('rebuild_search_index', batch_size=2, stdout=StringIO())
+        self.assertEqual(list(self.search('собаки').context['page_obj']),
+                         [self.other])
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.guest_client.force_login(admin)
+        response = self.guest_client.get(ADMIN_URL, {'q': 'собак'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.other]
+        )
+
+    def test_index_untouched_without_fts5(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.guest_client.force_login(admin)
+        indexed = Post.objects.create(text='Попугаи спят', author=admin)
+        indexed_pk = indexed.pk
+        # На других базах таблицы FTS5 нет: в неё не пишут и по ней не ищут
+        with mock.patch('posts.search.enabled', return_value=False):
+            post = Post.objects.create(text='Попугаи летают', author=admin)
+            self.assertFalse(self.search('собаки').context['page_obj'])
+            response = self.guest_client.get(ADMIN_URL, {'q': 'летают'})
+            self.assertEqual(
+                list(response.context['cl'].result_list), [post]
+            )
+            indexed.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE rowid IN (%s, %s)',
+                [post.pk, indexed_pk]
+            )
+            self.assertEqual(cursor.fetchall(), [(indexed_pk,)])
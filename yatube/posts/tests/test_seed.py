@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import AuthorStats, Comment, Group, Post, User
+from ..search import match_expression, ranked_ids
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SEED_OPTIONS = dict(
+    users=5, groups=2, posts=30, comments=40,
+    image_ratio=0.5, placeholders=2, batch_size=7,
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, seed):
+        call_command('seed_yatube', seed=seed, stdout=StringIO(),
+                     **SEED_OPTIONS)
+        snapshot = (
+            list(User.objects.order_by('pk').values_list('username')),
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'pub_date', 'author__username', 'group__slug', 'image'
+            )),
+            list(Comment.objects.order_by('pk').values_list(
+                'text', 'created', 'post__text'
+            )),
+        )
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        User.objects.all().delete()
+        return snapshot
+
+    def test_seed_creates_rows_and_counters(self):
+        call_command('seed_yatube', stdout=StringIO(), **SEED_OPTIONS)
+        self.assertEqual(User.objects.count(), SEED_OPTIONS['users'])
+        self.assertEqual(Group.objects.count(), SEED_OPTIONS['groups'])
+        self.assertEqual(Post.objects.count(), SEED_OPTIONS['posts'])
+        self.assertEqual(Comment.objects.count(), SEED_OPTIONS['comments'])
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertEqual(
+            sum(AuthorStats.objects.values_list('posts_count', flat=True)),
+            SEED_OPTIONS['posts']
+        )
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)),
+            SEED_OPTIONS['comments']
+        )
+
+    def test_same_seed_same_data(self):
+        first = self.seed(1)
+        self.assertEqual(first, self.seed(1))
+        self.assertNotEqual(first, self.seed(2))
+
+    def test_no_placeholders_without_images(self):
+        media_root = tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT)
+        with override_settings(MEDIA_ROOT=media_root):
+            call_command(
+                'seed_yatube', stdout=StringIO(),
+                **{**SEED_OPTIONS, 'image_ratio': 0}
+            )
+        self.assertFalse(Post.objects.exclude(image='').exists())
+        self.assertEqual(os.listdir(media_root), [])
+
+    @override_settings(PAGE_CACHE_ENABLED=True, THUMBNAIL_BUILD=False)
+    def test_derived_data_refreshed(self):
+        cache.clear()
+        Client().get(reverse('posts:index'))
+        call_command('seed_yatube', stdout=StringIO(), **SEED_OPTIONS)
+        post = Post.objects.latest('pk')
+        self.assertContains(Client().get(reverse('posts:index')), post.text)
+        self.assertContains(
+            Client().get(reverse(
+                'posts:profile', args=[post.author.username]
+            )),
+            post.text
+        )
+        found = [pk for pk, _ in ranked_ids(
+            match_expression(post.text), SEED_OPTIONS['posts']
+        )]
+        self.assertIn(post.pk, found)
@@ -0,0 +1,191 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from ..models import Group, Post, User
+from .. import thumbnails
+from ..thumbnails import (
+    WIDTHS, build, built_thumbnail, cap_original, schedule
+)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+USERNAME = 'Roman'
+GROUP_SLUG = 'test-slug'
+INDEX_URL = reverse('posts:index')
+GROUP_LIST_URL = reverse('posts:posts_slug', args=[GROUP_SLUG])
+PROFILE_URL = reverse('posts:profile', args=[USERNAME])
+FEED_URLS = [INDEX_URL, GROUP_LIST_URL, PROFILE_URL]
+IMAGE_POSTS = 4
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_ASYNC=False)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug=GROUP_SLUG,
+            description='Тестовое описание',
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        caches['thumbnails'].clear()
+        self.guest_client = Client()
+        self.post = self.create_post()
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            group=self.group,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    def kvstore_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        return response, [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+
+    def test_render_does_not_wait_for_thumbnail(self):
+        '''Первый рендер без картинки, следующий уже с миниатюрой.'''
+        self.assertIsNone(built_thumbnail(self.post.image))
+        # Сборку, которую в продакшене делает фоновый пул, — после ответа
+        with mock.patch.object(thumbnails, 'schedule') as scheduled:
+            first = self.guest_client.get(INDEX_URL)
+        scheduled.assert_called_once_with(self.post.image.name)
+        build(self.post.image.name)
+        thumbnail = built_thumbnail(self.post.image)
+        self.assertIsNotNone(thumbnail)
+        self.assertNotContains(first, thumbnail.url)
+        for url in FEED_URLS:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), thumbnail.url)
+
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_build_purges_cached_post_pages(self):
+        urls = [
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:api_post_detail', args=[self.post.pk]),
+        ]
+        with mock.patch.object(thumbnails, 'schedule'):
+            for url in urls:
+                self.guest_client.get(url)
+        thumbnail = build(self.post.image.name)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), thumbnail.url)
+
+    def test_variants_rendered_with_srcset(self):
+        thumbnail = build(self.post.image.name)
+        response = self.guest_client.get(INDEX_URL)
+        for format, extension in (('WEBP', 'webp'), ('JPEG', 'jpg')):
+            for width in WIDTHS:
+                with self.subTest(format=format, width=width):
+                    file = thumbnail.files[format, width]
+                    self.assertTrue(file.url.endswith(extension))
+                    self.assertEqual(file.width, width)
+                    self.assertContains(response, f'{file.url} {width}w')
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_names_match_sorl(self):
+        thumbnail = build(self.post.image.name)
+        self.assertEqual(
+            thumbnail.files['JPEG', max(WIDTHS)].name,
+            get_thumbnail(
+                self.post.image.name, f'{max(WIDTHS)}x339',
+                format='JPEG', crop='center', upscale=True
+            ).name
+        )
+
+    def test_failed_build_not_rescheduled(self):
+        name = 'posts/missing.gif'
+        self.addCleanup(thumbnails._failed.pop, name, None)
+        with self.assertLogs('posts.thumbnails', 'ERROR'):
+            schedule(name)
+        with self.assertNoLogs('posts.thumbnails', 'ERROR'):
+            self.assertIsNone(schedule(name))
+        with override_settings(THUMBNAIL_RETRY_FAILED=0):
+            with self.assertLogs('posts.thumbnails', 'ERROR'):
+                schedule(name)
+
+    def test_large_original_capped(self):
+        buffer = io.BytesIO()
+        Image.new('RGBA', (4000, 1000), 'red').save(buffer, 'PNG')
+        upload = SimpleUploadedFile('big.png', buffer.getvalue())
+        with override_settings(IMAGE_MAX_SIDE=1000):
+            capped = cap_original(upload)
+        self.assertEqual(capped.name, 'big.jpg')
+        with Image.open(capped) as image:
+            self.assertEqual(
+                (image.format, image.size), ('JPEG', (1000, 250))
+            )
+        small = SimpleUploadedFile('small.gif', SMALL_GIF)
+        self.assertIs(cap_original(small), small)
+
+    def test_built_thumbnail_rendered_without_pil(self):
+        thumbnail = build(self.post.image.name)
+        self.assertEqual(
+            (thumbnail.width, thumbnail.height), (960, 339)
+        )
+        with mock.patch('posts.thumbnails.get_thumbnail') as get_thumbnail:
+            response = self.guest_client.get(
+                reverse('posts:post_detail', args=[self.post.pk])
+            )
+        get_thumbnail.assert_not_called()
+        self.assertContains(response, thumbnail.url)
+
+    def test_page_thumbnails_resolved_in_one_lookup(self):
+        posts = [self.post] + [
+            self.create_post() for _ in range(IMAGE_POSTS - 1)
+        ]
+        thumbnails = [build(post.image.name) for post in posts]
+        for url in FEED_URLS:
+            with self.subTest(url=url):
+                cache.clear()
+                caches['thumbnails'].clear()
+                response, queries = self.kvstore_queries(url)
+                self.assertEqual(len(queries), 1)
+                for thumbnail in thumbnails:
+                    self.assertContains(response, thumbnail.url)
+                self.assertIn(
+                    f'thumb;desc="hit={IMAGE_POSTS} miss=0"',
+                    response['Server-Timing']
+                )
+                # KV-хранилище уже в кэше: к БД не ходим вовсе
+                cache.clear()
+                response, queries = self.kvstore_queries(url)
+                self.assertEqual(queries, [])
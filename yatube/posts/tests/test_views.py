@@ -7,7 +7,8 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 
 from yatube.settings import PAGINATOR_COUNT
-from posts.models import Group, Post, User
+from posts.models import Comment, Group, Post, User
+from posts.thumbnails import build
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -65,6 +66,8 @@ class PostsPagesTest(TestCase):
             group=cls.group,
             image=uploaded
         )
+        # Сигнал строит миниатюры on_commit, которого в TestCase нет
+        build(cls.post.image.name)
         cls.POST_DETAIL_URL = reverse('posts:post_detail', args=[cls.post.id])
         cls.POST_EDIT_URL = reverse('posts:post_edit', args=[cls.post.id])
 
@@ -162,3 +165,44 @@ class PostsPagesTest(TestCase):
                     self.assertEqual(
                         len(response.context['page_obj'], page_count)
                     )
+
+
+class QueryBudgetViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=USERNAME)
+        cls.group = Group.objects.create(
+            title=GROUP_TITLE,
+            slug=GROUP_SLUG,
+            description=GROUP_DESCRIPTION,
+        )
+        # У каждого поста свой автор: N+1 по авторам сразу бы вылез
+        for i in range(PAGINATOR_COUNT + OTHER_PAGES):
+            author = User.objects.create_user(username=f'author{i}')
+            post = Post.objects.create(
+                text=f'Post {i}', author=author, group=cls.group
+            )
+            Comment.objects.create(post=post, author=author, text='Text')
+        cls.post = post
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_views_fit_query_budget(self):
+        '''Страницы укладываются в бюджет запросов при полной ленте.'''
+        urls = [
+            INDEX_URL,
+            GROUP_LIST_URL,
+            reverse('posts:profile', args=[self.post.author.username]),
+            reverse('posts:post_detail', args=[self.post.id]),
+            reverse('posts:post_comments', args=[self.post.id]),
+            reverse('posts:search') + '?q=Post',
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.authorized_client.get(url).status_code, 200
+                )
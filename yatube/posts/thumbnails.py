@@ -0,0 +1,282 @@
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from PIL import Image, ImageOps
+from sorl.thumbnail import base, default, get_thumbnail
+from sorl.thumbnail.base import EXTENSIONS
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import ImageFile
+
+from core import timing
+from core.pagecache import purge
+from .cache import (
+    INDEX_FEED, bump_feeds, group_feed, post_key, profile_feed
+)
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Картинка поста во всех лентах и на странице поста: кроп 960x339
+# в нескольких ширинах и форматах, браузер выбирает по srcset
+WIDTHS = (320, 640, 960)
+RATIO = 339 / 960
+FORMATS = ('WEBP', 'JPEG')
+FALLBACK_FORMAT = 'JPEG'
+OPTIONS = {'crop': 'center', 'upscale': True}
+SIZES = '(max-width: 960px) 100vw, 960px'
+
+_executor = None
+_executor_lock = threading.Lock()
+# Имена в очереди и {имя: время} неудачных сборок: их не ставим снова
+_pending = set()
+_failed = {}
+_scheduled_lock = threading.Lock()
+
+
+def thumbnail_name(source, geometry, options):
+    """
+    Имя файла миниатюры, как его считает sorl 12.x. Своя функция, а не
+    приватный метод бэкенда: ею же имена считает и ThumbnailBackend,
+    так что новая версия sorl не разведёт их.
+    """
+    key = tokey(source.key, geometry, serialize(options))
+    return (
+        f'{sorl_settings.THUMBNAIL_PREFIX}{key[:2]}/{key[2:4]}/{key}.'
+        f'{EXTENSIONS[options["format"]]}'
+    )
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    """Бэкенд sorl (THUMBNAIL_BACKEND) с именами из thumbnail_name()."""
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        return thumbnail_name(source, geometry_string, options)
+
+
+def thumbnail_file(source, geometry, **options):
+    """
+    Файл миниатюры с тем же именем, что дал бы sorl `get_thumbnail`,
+    но без чтения исходника и без генерации. Формат задаётся явно.
+    """
+    backend = default.backend
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(
+        thumbnail_name(source, geometry, options), default.storage
+    )
+
+
+def variant_files(source):
+    """{(формат, ширина): файл миниатюры} для всех вариантов картинки."""
+    return {
+        (format, width): thumbnail_file(
+            source, f'{width}x{round(width * RATIO)}',
+            format=format, **OPTIONS
+        )
+        for format in FORMATS for width in WIDTHS
+    }
+
+
+class ResponsiveImage:
+    """Готовые варианты картинки для <picture> с srcset."""
+
+    sizes = SIZES
+
+    def __init__(self, files):
+        self.files = files
+        self.fallback = files[FALLBACK_FORMAT, max(WIDTHS)]
+
+    def srcset(self, format):
+        return ', '.join(
+            f'{self.files[format, width].url} {width}w' for width in WIDTHS
+        )
+
+    @property
+    def webp_srcset(self):
+        return self.srcset('WEBP')
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('JPEG')
+
+    @property
+    def url(self):
+        return self.fallback.url
+
+    @property
+    def width(self):
+        return self.fallback.width
+
+    @property
+    def height(self):
+        return self.fallback.height
+
+
+def built_thumbnails(images):
+    """
+    {имя картинки: ResponsiveImage или None} для всей страницы разом:
+    один get_many к кэшу и не больше одного запроса к БД. Картинка
+    считается готовой, только когда построены все её варианты.
+    Картинки — файлы поля или просто имена из values().
+    """
+    files = {
+        getattr(image, 'name', image): variant_files(ImageFile(image))
+        for image in images if image
+    }
+    found = default.kvstore.get_many(
+        file for variants in files.values() for file in variants.values()
+    )
+    thumbnails = {}
+    for name, variants in files.items():
+        built = {key: found[file.key] for key, file in variants.items()}
+        thumbnails[name] = (
+            ResponsiveImage(built) if all(built.values()) else None
+        )
+    return thumbnails
+
+
+def page_thumbnails(images):
+    """
+    built_thumbnails() для страницы ленты: недостающие миниатюры
+    ставятся в генерацию, попадания и промахи идут в Server-Timing.
+    """
+    thumbnails = built_thumbnails(images)
+    missing = {name for name, thumbnail in thumbnails.items()
+               if thumbnail is None}
+    timing.record_thumbnails(
+        hits=len(thumbnails) - len(missing), misses=len(missing)
+    )
+    for name in missing:
+        schedule(name)
+    return thumbnails
+
+
+def built_thumbnail(image):
+    """Готовые варианты одной картинки или None; ничего не генерирует."""
+    if not image:
+        return None
+    return built_thumbnails([image])[image.name]
+
+
+def build(name):
+    """
+    Генерирует все варианты картинки `name` и кладёт их в KV-хранилище.
+    Ленты и страницы постов, закэшированные без картинки, сбрасываются.
+    """
+    try:
+        # Без исходника sorl молча вернёт пустые файлы: это тоже неудача
+        if not default.storage.exists(name):
+            raise FileNotFoundError(name)
+        thumbnail = ResponsiveImage({
+            (format, width): get_thumbnail(
+                name, f'{width}x{round(width * RATIO)}',
+                format=format, **OPTIONS
+            )
+            for format in FORMATS for width in WIDTHS
+        })
+        feeds, pages = {INDEX_FEED}, set()
+        for pk, author_id, group_id in Post.objects.filter(
+            image=name
+        ).values_list('pk', 'author_id', 'group_id'):
+            feeds.add(profile_feed(author_id))
+            if group_id:
+                feeds.add(group_feed(group_id))
+            pages.add(post_key(pk))
+        bump_feeds(*feeds)
+        # Страница поста и её JSON закэшированы ещё без картинки
+        purge(*pages)
+        return thumbnail
+    except Exception:
+        logger.exception('Не удалось построить миниатюру %s', name)
+        with _scheduled_lock:
+            _failed[name] = time.monotonic()
+    finally:
+        with _scheduled_lock:
+            _pending.discard(name)
+        # Поток пула живёт долго: не держим его соединения открытыми
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def cap_original(upload):
+    """
+    Уменьшает загрузку больше IMAGE_MAX_SIDE по длинной стороне или
+    тяжелее IMAGE_MAX_BYTES и пережимает её в JPEG. Остальные файлы
+    возвращаются как есть.
+    """
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if (max(image.size) <= settings.IMAGE_MAX_SIDE
+                and upload.size <= settings.IMAGE_MAX_BYTES):
+            upload.seek(0)
+            return upload
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(
+            (settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_SIDE), Image.LANCZOS
+        )
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Прозрачность в JPEG не бывает: кладём на белый фон
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        buffer = io.BytesIO()
+        image.save(
+            buffer, 'JPEG', quality=settings.IMAGE_QUALITY,
+            optimize=True, progressive=True
+        )
+    name = os.path.splitext(os.path.basename(upload.name))[0]
+    return SimpleUploadedFile(
+        f'{name}.jpg', buffer.getvalue(), content_type='image/jpeg'
+    )
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def schedule(name):
+    """
+    Ставит генерацию в фоновый пул (или строит сразу, если он выключен).
+    Картинка, которая уже в очереди или не собралась за последние
+    THUMBNAIL_RETRY_FAILED секунд, не ставится снова: иначе каждый показ
+    страницы с битой картинкой заново запускал бы и логировал сборку.
+    THUMBNAIL_BUILD = False выключает генерацию совсем.
+    """
+    if not settings.THUMBNAIL_BUILD:
+        return None
+    with _scheduled_lock:
+        failed = _failed.get(name)
+        if failed is not None and (
+            time.monotonic() - failed < settings.THUMBNAIL_RETRY_FAILED
+        ):
+            return None
+        if name in _pending:
+            return None
+        _failed.pop(name, None)
+        _pending.add(name)
+    if settings.THUMBNAIL_ASYNC:
+        return _get_executor().submit(build, name)
+    return build(name)
@@ -0,0 +1,228 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from core.db import write_transaction
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .paginator import CursorPage, decode_cursor
+
+ENTRY_TABLE = TimelineEntry._meta.db_table
+FOLLOW_TABLE = Follow._meta.db_table
+POST_TABLE = Post._meta.db_table
+STATS_TABLE = AuthorStats._meta.db_table
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+# Автор раскладывается по лентам, только если подписчиков не больше
+# TIMELINE_FANOUT_LIMIT; иначе его посты подмешиваются при чтении
+FANNED_OUT_AUTHOR = (
+    f'NOT EXISTS (SELECT 1 FROM {STATS_TABLE} stats '
+    'WHERE stats.author_id = post.author_id AND followers_count > %s)'
+)
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты подписчиков автора одним INSERT ... SELECT."""
+    fan_out_range(post.pk, post.pk)
+
+
+def fan_out_range(first_pk, last_pk):
+    """Раскладывает посты с id от first_pk до last_pk (массовый импорт)."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR IGNORE INTO {ENTRY_TABLE} '
+            '(user_id, post_id, author_id, pub_date) '
+            'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+            f'FROM {POST_TABLE} post JOIN {FOLLOW_TABLE} follow '
+            'ON follow.author_id = post.author_id '
+            f'WHERE post.id BETWEEN %s AND %s AND {FANNED_OUT_AUTHOR}',
+            [first_pk, last_pk, settings.TIMELINE_FANOUT_LIMIT]
+        )
+
+
+def backfill(user_id, author_id):
+    """Последние посты автора в ленту нового подписчика."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR IGNORE INTO {ENTRY_TABLE} '
+            '(user_id, post_id, author_id, pub_date) '
+            f'SELECT %s, id, author_id, pub_date FROM {POST_TABLE} post '
+            f'WHERE author_id = %s AND {FANNED_OUT_AUTHOR} '
+            'ORDER BY pub_date DESC, id DESC LIMIT %s',
+            [
+                user_id, author_id,
+                settings.TIMELINE_FANOUT_LIMIT, settings.TIMELINE_LENGTH,
+            ]
+        )
+
+
+def backfill_followers(author_id):
+    """
+    Последние посты автора в ленты всех его подписчиков. Нужен, когда
+    число подписчиков опустилось до TIMELINE_FANOUT_LIMIT: посты,
+    вышедшие, пока автора подмешивали при чтении, ни в одну ленту не
+    разложены. Подписчики идут пачками по TIMELINE_BACKFILL_BATCH, каждая
+    в своей транзакции: блокировка записи не держится на всю работу.
+    """
+    try:
+        last_user_id = 0
+        while True:
+            with write_transaction():
+                user_ids = list(Follow.objects.filter(
+                    author_id=author_id, user_id__gt=last_user_id
+                ).order_by('user_id').values_list('user_id', flat=True)[
+                    :settings.TIMELINE_BACKFILL_BATCH
+                ])
+                if not user_ids:
+                    return
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'INSERT OR IGNORE INTO {ENTRY_TABLE} '
+                        '(user_id, post_id, author_id, pub_date) '
+                        'SELECT follow.user_id, post.id, post.author_id, '
+                        f'post.pub_date FROM (SELECT id, author_id, pub_date '
+                        f'FROM {POST_TABLE} WHERE author_id = %s '
+                        'ORDER BY pub_date DESC, id DESC LIMIT %s) post '
+                        f'JOIN {FOLLOW_TABLE} follow '
+                        'ON follow.author_id = post.author_id '
+                        'WHERE follow.user_id BETWEEN %s AND %s',
+                        [
+                            author_id, settings.TIMELINE_LENGTH,
+                            user_ids[0], user_ids[-1],
+                        ]
+                    )
+                trim(user_ids, settings.TIMELINE_LENGTH)
+            last_user_id = user_ids[-1]
+    except Exception:
+        logger.exception('Не удалось дополнить ленты автора %s', author_id)
+    finally:
+        with _pending_lock:
+            _pending.discard(author_id)
+        # Поток пула живёт долго: не держим его соединения открытыми
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def _get_executor():
+    global _executor
+    with _pending_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='timelines'
+            )
+    return _executor
+
+
+def schedule_backfill(author_id):
+    """
+    Ставит backfill_followers() в фоновый поток (или выполняет сразу,
+    если TIMELINE_BACKFILL_ASYNC выключен): запрос читателя, который
+    отписался, не ждёт заполнения чужих лент. Автор, чьи ленты уже
+    дополняются, второй раз в очередь не встаёт.
+    """
+    with _pending_lock:
+        if author_id in _pending:
+            return None
+        _pending.add(author_id)
+    if settings.TIMELINE_BACKFILL_ASYNC:
+        return _get_executor().submit(backfill_followers, author_id)
+    return backfill_followers(author_id)
+
+
+def forget_author(user_id, author_id):
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def trim(user_ids, length):
+    """Оставляет читателям `user_ids` только `length` новых записей ленты."""
+    if not user_ids:
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {ENTRY_TABLE} WHERE id IN ('
+            'SELECT id FROM (SELECT id, ROW_NUMBER() OVER ('
+            'PARTITION BY user_id ORDER BY pub_date DESC, post_id DESC'
+            f') AS position FROM {ENTRY_TABLE} '
+            f'WHERE user_id IN ({", ".join(["%s"] * len(user_ids))})'
+            ') WHERE position > %s)',
+            [*user_ids, length]
+        )
+        return cursor.rowcount
+
+
+def keyset(queryset, pk_field, key, backward, limit):
+    """[(pub_date, id поста)] после ключа `key` в порядке ленты."""
+    if backward:
+        op, ordering = 'gt', ('pub_date', pk_field)
+    else:
+        op, ordering = 'lt', ('-pub_date', f'-{pk_field}')
+    if key:
+        pub_date, pk = key
+        queryset = queryset.filter(
+            Q(**{f'pub_date__{op}': pub_date})
+            | Q(pub_date=pub_date, **{f'{pk_field}__{op}': pk})
+        )
+    return list(
+        queryset.order_by(*ordering).values_list('pub_date', pk_field)[:limit]
+    )
+
+
+class TimelinePage(CursorPage):
+    """
+    Страница ленты подписок: разложенные записи читателя вперемешку
+    с постами авторов, которых читают при показе (fan-out on read).
+    """
+
+    @cached_property
+    def _window(self):
+        paginator = self.paginator
+        per_page = paginator.per_page
+        backward = bool(self.before_key)
+        key = self.before_key or self.after_key
+        rows = sorted(set(
+            keyset(paginator.entries, 'post_id', key, backward, per_page + 1)
+            + keyset(paginator.pulled, 'pk', key, backward, per_page + 1)
+        ), reverse=not backward)
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+        if backward:
+            rows.reverse()
+        posts = paginator.queryset.in_bulk([pk for _, pk in rows])
+        # Запись могла пережить пост, удалённый в обход ORM
+        object_list = [posts[pk] for _, pk in rows if pk in posts]
+        if backward:
+            return object_list, True, more
+        return object_list, more, bool(self.after_key)
+
+
+class TimelinePaginator:
+    """Курсорная пагинация ленты подписок по ключу (pub_date, id)."""
+    is_cursor = True
+    field = 'pub_date'
+
+    def __init__(self, user, per_page):
+        self.per_page = int(per_page)
+        self.queryset = Post.objects.select_related('author', 'group')
+        self.entries = TimelineEntry.objects.filter(user=user)
+        pulled_authors = list(Follow.objects.filter(
+            user=user,
+            author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT
+        ).values_list('author_id', flat=True))
+        self.pulled = Post.objects.filter(author_id__in=pulled_authors)
+        if not pulled_authors:
+            self.pulled = self.pulled.none()
+
+    def get_page(self, after=None, before=None):
+        before_key = decode_cursor(before)
+        if before_key:
+            return TimelinePage(self, before_key=before_key)
+        return TimelinePage(self, after_key=decode_cursor(after))
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
@@ -20,11 +20,46 @@ urlpatterns = [
         views.profile,
         name='profile'
     ),
+    path(
+        'group/<slug:slug>/export/',
+        views.group_export,
+        name='group_export'
+    ),
+    path(
+        'profile/<str:username>/export/',
+        views.profile_export,
+        name='profile_export'
+    ),
+    path(
+        'profile/<str:username>/follow/',
+        views.profile_follow,
+        name='profile_follow'
+    ),
+    path(
+        'profile/<str:username>/unfollow/',
+        views.profile_unfollow,
+        name='profile_unfollow'
+    ),
+    path(
+        'follow/',
+        views.follow_index,
+        name='follow_index'
+    ),
+    path(
+        'search/',
+        views.search,
+        name='search'
+    ),
     path(
         'posts/<int:post_id>/',
         views.post_detail,
         name='post_detail'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'create/',
         views.post_create,
@@ -39,5 +74,25 @@ urlpatterns = [
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'
-    )
+    ),
+    path(
+        'api/posts/',
+        api.index,
+        name='api_index'
+    ),
+    path(
+        'api/group/<slug:slug>/',
+        api.group_posts,
+        name='api_posts_slug'
+    ),
+    path(
+        'api/profile/<str:username>/',
+        api.profile,
+        name='api_profile'
+    ),
+    path(
+        'api/posts/<int:post_id>/',
+        api.post_detail,
+        name='api_post_detail'
+    ),
 ]
@@ -1,43 +1,230 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.http import (
+    Http404, HttpResponseBadRequest, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
 
+from core.decorators import call_with_retries, query_budget, retry_on_locked
+from core.pagecache import (
+    anonymous_page_cache, page_validators, tag_page
+)
+from .cache import (
+    INDEX_FEED, author_key, feed_cache, feed_key, group_feed, group_key,
+    post_key, profile_feed
+)
+from .export import ENCODERS, export
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User
-from .paginator import paginator_page
+from .models import Comment, Follow, Group, Post, User
+from .paginator import AFTER, BEFORE, CursorPaginator, paginator_page
+from .search import SearchPaginator
+from .timeline import TimelinePaginator
+
+# add_comment отвечает фрагментом с новым комментарием вместо редиректа,
+# если в запросе есть ?fragment=1 или Accept: text/html-fragment
+FRAGMENT_PARAM = 'fragment'
+FRAGMENT_MEDIA_TYPE = 'text/html-fragment'
+# Бюджеты страниц с картинками включают один запрос миниатюр страницы
+# к KV-хранилищу sorl (posts.kvstore.KVStore.get_many) при промахе кэша
+
+
+# Ключи страниц для ETag до вызова вьюхи (page_validators): те же,
+# что вьюхи ставят через tag_page(), по одному лёгкому запросу
+def index_keys(request):
+    return [feed_key(INDEX_FEED)]
+
+
+def group_keys(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return None
+    return [feed_key(group_feed(group_id)), group_key(group_id)]
+
 
+def profile_keys(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return None
+    return [feed_key(profile_feed(author_id)), author_key(author_id)]
 
+
+def post_keys(request, post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'author_id', 'group_id'
+    ).first()
+    if post is None:
+        return None
+    keys = [post_key(post_id), author_key(post['author_id'])]
+    if post['group_id']:
+        keys.append(group_key(post['group_id']))
+    return keys
+
+
+@anonymous_page_cache
+@page_validators(index_keys)
+@query_budget(5)
 def index(request):
+    tag_page(request, feed_key(INDEX_FEED))
+    posts = Post.objects.select_related('author', 'group')
+    page_obj = paginator_page(request, posts, 'index')
     return render(request, 'posts/index.html', {
-        'page_obj': paginator_page(request, Post.objects.all()),
+        'page_obj': page_obj,
+        **feed_cache(INDEX_FEED, page_obj),
     })
 
 
+@anonymous_page_cache
+@page_validators(group_keys)
+@query_budget(5)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
+    tag_page(request, feed_key(group_feed(group.pk)), group_key(group.pk))
+    posts = group.posts.select_related('author', 'group')
+    page_obj = paginator_page(request, posts, 'group', group)
     return render(request, 'posts/group_list.html', {
         'group': group,
-        'page_obj': paginator_page(request, group.posts.all())
+        'page_obj': page_obj,
+        **feed_cache(group_feed(group.pk), page_obj),
     })
 
 
+@anonymous_page_cache
+@page_validators(profile_keys)
+@query_budget(6)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    tag_page(
+        request, feed_key(profile_feed(author.pk)), author_key(author.pk)
+    )
+    posts = author.posts.select_related('author', 'group')
+    # Анонимам страница отдаётся из кэша, подписка есть только у вошедших
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author
+    ).exists()
+    page_obj = paginator_page(request, posts, 'profile', author)
     return render(request, 'posts/profile.html', {
         'author': author,
-        'page_obj': paginator_page(request, author.posts.all())
+        'following': following,
+        'page_obj': page_obj,
+        **feed_cache(profile_feed(author.pk), page_obj),
     })
 
 
+@login_required
+@query_budget(6)
+def follow_index(request):
+    page_obj = TimelinePaginator(
+        request.user, settings.PAGINATOR_COUNT
+    ).get_page(request.GET.get(AFTER), request.GET.get(BEFORE))
+    return render(request, 'posts/follow.html', {'page_obj': page_obj})
+
+
+@login_required
+@require_POST
+@retry_on_locked
+@query_budget(5)
+def profile_follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        Follow.objects.get_or_create(user=request.user, author=author)
+    return redirect('posts:profile', username)
+
+
+@login_required
+@require_POST
+@retry_on_locked
+@query_budget(6)
+def profile_unfollow(request, username):
+    author = get_object_or_404(User, username=username)
+    # Удаление по одному объекту, чтобы сработал сигнал post_delete
+    for follow in Follow.objects.filter(user=request.user, author=author):
+        follow.delete()
+    return redirect('posts:profile', username)
+
+
+@query_budget(5)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = SearchPaginator(query, settings.PAGINATOR_COUNT).get_page(
+        request.GET.get(AFTER), request.GET.get(BEFORE)
+    )
+    return render(request, 'posts/search.html', {
+        'query': query,
+        'page_obj': page_obj,
+        'page_params': f"{urlencode({'q': query})}&",
+    })
+
+
+def comments_page(request, post_id):
+    """Страница комментариев по курсору: старые сверху, ?after= — дальше."""
+    return CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PAGINATOR_COUNT, field='created', descending=False
+    ).get_page(request.GET.get(AFTER), request.GET.get(BEFORE))
+
+
+@anonymous_page_cache
+@page_validators(post_keys)
+@query_budget(5)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    tag_page(request, post_key(post.pk), author_key(post.author_id))
+    if post.group_id:
+        tag_page(request, group_key(post.group_id))
     return render(request, 'posts/post_detail.html', {
-        'post': get_object_or_404(Post, pk=post_id),
+        'post': post,
         'form': CommentForm(),
-        'comments': post.comments.all()
+        'comments': comments_page(request, post.pk),
     })
 
 
+@anonymous_page_cache
+@query_budget(2)
+def post_comments(request, post_id):
+    """Следующая страница комментариев фрагментом для догрузки."""
+    # Без проверки пустой фрагмент несуществующего поста попал бы в кэш
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404('Поста нет.')
+    tag_page(request, post_key(post_id))
+    return render(request, 'posts/includes/comments.html', {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id),
+    })
+
+
+def save_post(post):
+    """
+    Сохраняет пост с повторами при «database is locked». Новая картинка
+    пишется в хранилище один раз, до транзакции: хранилище не
+    откатывается, и каждый повтор оставлял бы свою копию файла.
+    Если запись так и не удалась, файл удаляется.
+    """
+    image = post.image
+    stored = bool(image) and not image._committed
+    if stored:
+        image.save(image.name, image.file, save=False)
+    try:
+        call_with_retries(post.save)
+    except Exception:
+        if stored:
+            image.storage.delete(image.name)
+        raise
+
+
 @login_required
+@query_budget(8)
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -49,14 +236,15 @@ def post_create(request):
         })
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    save_post(post)
     return redirect('posts:profile', post.author)
 
 
 @login_required
+@query_budget(7)
 def post_edit(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    if request.user != post.author:
+    if request.user.pk != post.author_id:
         return redirect('posts:post_detail', post_id)
     form = PostForm(
         request.POST or None,
@@ -64,7 +252,7 @@ def post_edit(request, post_id):
         instance=post,
     )
     if form.is_valid():
-        form.save()
+        save_post(form.save(commit=False))
         return redirect('posts:post_detail', post_id)
     return render(request, 'posts/create_post.html', {
         'form': form, 'is_edit': True, 'post': post
@@ -72,12 +260,65 @@ def post_edit(request, post_id):
 
 
 @login_required
+@retry_on_locked
+@query_budget(3)
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
+    fragment = wants_fragment(request)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
         comment.save()
+        if fragment:
+            return render(request, 'posts/includes/comment_item.html', {
+                'comment': comment,
+            })
+    elif fragment:
+        return HttpResponseBadRequest(form.errors.as_ul())
     return redirect('posts:post_detail', post_id=post_id)
+
+
+@login_required
+@query_budget(3)
+def profile_export(request, username):
+    """Посты автора и комментарии к ним — самому автору и персоналу."""
+    author = get_object_or_404(User, username=username)
+    if author != request.user and not request.user.is_staff:
+        raise PermissionDenied
+    return export_response(request, author.posts.all(), f'posts-{username}')
+
+
+@login_required
+@query_budget(3)
+def group_export(request, slug):
+    if not request.user.is_staff:
+        raise PermissionDenied
+    group = get_object_or_404(Group, slug=slug)
+    return export_response(request, group.posts.all(), f'group-{slug}')
+
+
+def export_response(request, posts, filename):
+    """
+    ?format=jsonl|csv, ?images=1 — zip с картинками. Запросы к базе идут
+    уже при отдаче ответа, кусками, так что память не зависит от объёма.
+    """
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in ENCODERS:
+        return HttpResponseBadRequest(
+            f'format: {", ".join(sorted(ENCODERS))}'
+        )
+    chunks, content_type, name = export(
+        posts, file_format, filename, bool(request.GET.get('images'))
+    )
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{name}"'
+    return response
+
+
+def wants_fragment(request):
+    return (
+        FRAGMENT_PARAM in request.GET
+        or FRAGMENT_MEDIA_TYPE in request.META.get('HTTP_ACCEPT', '')
+    )
@@ -0,0 +1,58 @@
+// «Ещё комментарии» догружает следующую порцию фрагментом
+// вместо перехода на страницу; без JS ссылка работает как обычная
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('[data-comments-more]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.dataset.commentsMore)
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      link.closest('.comments-more').outerHTML = html;
+    })
+    .catch(function () {
+      window.location = link.href;
+    });
+});
+
+// Отправка комментария без перезагрузки: сервер отвечает фрагментом
+// с новым комментарием; при ошибке форма отправляется как обычно
+document.addEventListener('submit', function (event) {
+  var form = event.target.closest('[data-comment-form]');
+  if (!form) {
+    return;
+  }
+  event.preventDefault();
+  fetch(form.action, {
+    method: 'POST',
+    body: new FormData(form),
+    headers: {'Accept': 'text/html-fragment'},
+    credentials: 'same-origin'
+  })
+    .then(function (response) {
+      // Редирект (например, на вход) — не фрагмент
+      if (!response.ok || response.redirected) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      var comments = document.getElementById('comments');
+      var more = comments.querySelector('.comments-more');
+      if (more) {
+        more.insertAdjacentHTML('beforebegin', html);
+      } else {
+        comments.insertAdjacentHTML('beforeend', html);
+      }
+      form.reset();
+    })
+    .catch(function () {
+      form.submit();
+    });
+});
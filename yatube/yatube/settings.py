@@ -12,12 +12,45 @@ SECRET_KEY = '4fr7zddy!wgw-usj7k4tx(jq6!fb2fim15=f5=fstja7!s^ra@'
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+# Общий для всех воркеров кэш в файле SQLite; при наличии сервера —
+# core.cache.RedisCache (LOCATION 'redis://...') или core.cache.MemcachedCache.
+# Кэш переживает базу: после её подмены — manage.py clear_cache
 CACHES = {
+    # Целые страницы, фрагменты лент, числа постов и версии ключей.
+    # По умолчанию Django держит 300 записей: страницы вытесняли бы
+    # друг друга, не дождавшись второго читателя
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+    # KV-хранилище sorl: отдельно, чтобы фрагменты лент его не вытесняли
+    'thumbnails': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'TIMEOUT': None,
+        'OPTIONS': {'TABLE': 'thumbnails', 'MAX_ENTRIES': 100000},
+    },
 }
 
+# Тесты получают свой временный кэш (core.cache.isolated_caches)
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Как часто процесс прибавляет свою статистику кэша по префиксам
+# к общей (manage.py cache_stats), секунды
+CACHE_STATS_FLUSH_INTERVAL = 10
+
+# Фрагменты лент сбрасываются сигналами, таймаут лишь ограничивает мусор
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Целые страницы для анонимов (core.pagecache), сбрасываются по суррогатным
+# ключам. В разработке выключено, чтобы правки шаблонов были видны сразу
+PAGE_CACHE_ENABLED = not DEBUG
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+# Cache-Control и Surrogate-Key для кэширующего прокси перед сайтом
+PAGE_CACHE_PROXY_HEADERS = False
+PAGE_CACHE_PROXY_MAX_AGE = 60
+
 ALLOWED_HOSTS = [
     'localhost',
     '127.0.0.1',
@@ -26,6 +59,63 @@ ALLOWED_HOSTS = [
 ]
 
 PAGINATOR_COUNT = 10
+# Лента подписок (posts.timeline): сколько записей хранится у читателя
+# и сколько подписчиков может быть у автора, чтобы его посты
+# раскладывались по лентам при публикации, а не подмешивались при чтении
+TIMELINE_LENGTH = 1000
+TIMELINE_FANOUT_LIMIT = 10000
+# Когда подписчиков снова не больше лимита, посты автора дописываются
+# в их ленты в фоне, пачками подписчиков по TIMELINE_BACKFILL_BATCH
+TIMELINE_BACKFILL_ASYNC = True
+TIMELINE_BACKFILL_BATCH = 500
+# Комментарии на странице поста и в каждой догружаемой порции
+COMMENTS_PAGINATOR_COUNT = 20
+# Ленты ('index', 'group', 'profile') с пагинацией по курсору ?after=/?before=
+PAGINATOR_CURSOR_FEEDS = ()
+# Откуда нумерованная пагинация лент берёт число постов (posts.paginator):
+# 'exact' — COUNT(*), 'counter' — денормализованные счётчики,
+# 'cached' — COUNT в кэше до нового поста, 'estimate' — статистика таблицы;
+# либо путь к своей функции (queryset, feed, owner) -> int
+PAGINATOR_COUNT_STRATEGIES = {
+    'index': 'estimate',
+    'group': 'counter',
+    'profile': 'counter',
+}
+PAGINATOR_COUNT_CACHE_TIMEOUT = 60 * 5
+# До скольких строк 'estimate' считает отфильтрованную выборку точно
+PAGINATOR_ESTIMATE_EXACT_LIMIT = 10000
+# Глубина выдачи поиска: bm25 пересчитывается для всех совпадений
+# на каждой странице, поэтому листать дальше этого числа постов нельзя
+SEARCH_MAX_RESULTS = 500
+# Сколько строк выгрузка постов (posts.export) читает из базы за раз
+EXPORT_CHUNK_SIZE = 2000
+
+# Превышение бюджета запросов вьюхи: в разработке и тестах исключение,
+# в продакшене (DEBUG = False) только предупреждение в логе
+QUERY_BUDGET_RAISE = DEBUG
+
+# Server-Timing: заголовок в ответе и лог; медленные запросы — с SQL.
+# Заголовок раскрывает устройство сайта, поэтому в продакшене выключен
+SERVER_TIMING_HEADER = DEBUG
+SERVER_TIMING_SLOW_MS = 500
+SERVER_TIMING_SLOW_SAMPLE = 0.1
+SERVER_TIMING_MAX_SQL = 50
+
+# Миниатюры постов строятся в фоне после сохранения картинки;
+# THUMBNAIL_BUILD = False не строит их вовсе (тесты, которым они не нужны)
+THUMBNAIL_BUILD = True
+THUMBNAIL_ASYNC = True
+THUMBNAIL_WORKERS = 2
+# Через сколько секунд снова пробовать картинку, которая не собралась
+THUMBNAIL_RETRY_FAILED = 60 * 10
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_CACHE = 'thumbnails'
+
+# Оригинал больше этих пределов при загрузке уменьшается и пережимается
+IMAGE_MAX_SIDE = 2560
+IMAGE_MAX_BYTES = 2 * 1024 * 1024
+IMAGE_QUALITY = 85
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
@@ -47,6 +137,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,7 +154,8 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Django-шаблоны с замером рендера для Server-Timing
+        'BACKEND': 'core.timing.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -87,11 +179,33 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами потока: без открытия файла
+        # и PRAGMA на каждый запрос
+        'CONN_MAX_AGE': 60,
+        # Движок с BEGIN IMMEDIATE для core.db.write_transaction(); прочие
+        # транзакции отложенные и не берут блокировку записи при чтении
     }
 }
 
+# Применяются к каждому соединению (core.db.configure_sqlite). В WAL
+# читатели не ждут писателя; busy_timeout — сколько миллисекунд писатель
+# ждёт блокировку, прежде чем получить «database is locked»
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64 * 1024,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Повторы пишущих вьюх при «database is locked» (core.decorators)
+DB_WRITE_RETRIES = 5
+DB_WRITE_RETRY_DELAY = 0.05
+DB_WRITE_RETRY_MAX_DELAY = 1
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators